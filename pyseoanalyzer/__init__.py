@@ -22,4 +22,4 @@ except metadata.PackageNotFoundError:
     __version__ = "0.0.0-unknown"
 
 
-from .analyzer import analyze
+from .analyzer import analyze, analyze_async, iter_analyze
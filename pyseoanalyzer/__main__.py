@@ -6,7 +6,9 @@ import json
 import os
 import sys
 
-from .analyzer import analyze
+from .analyzer import analyze, iter_analyze
+from .llm_analyst import DEFAULT_MAX_INPUT_TOKENS, LLM_CACHE_TTL
+from .politeness import MAX_CRAWL_DELAY
 from . import __version__
 
 
@@ -28,6 +30,7 @@ def main():
         help="Output format.",
         choices=[
             "json",
+            "ndjson",
             "html",
         ],
         default="json",
@@ -57,25 +60,245 @@ def main():
         action="store_true",
         help="Run LLM analysis on the content.",
     )
+    arg_parser.add_argument(
+        "--llm-concurrency",
+        default=4,
+        type=int,
+        help="Maximum number of LLM calls in flight at once.",
+    )
+    arg_parser.add_argument(
+        "--llm-cache-dir",
+        default=None,
+        help="Directory to cache LLM results in. Unchanged pages are not sent to the model again.",
+    )
+    arg_parser.add_argument(
+        "--llm-cache-ttl",
+        default=LLM_CACHE_TTL,
+        type=float,
+        help="Seconds a cached LLM result is reused for (default one week).",
+    )
+    arg_parser.add_argument(
+        "--llm-max-input-tokens",
+        default=DEFAULT_MAX_INPUT_TOKENS,
+        type=int,
+        help="Approximate number of tokens of page data sent with each LLM call.",
+    )
+    arg_parser.add_argument(
+        "--llm-mode",
+        default="page",
+        choices=["page", "site"],
+        help="Analyze every page with the LLM, or only a sample of each group of similar pages.",
+    )
+    arg_parser.add_argument(
+        "--llm-samples-per-group",
+        default=2,
+        type=int,
+        help="Pages per group sent to the LLM in site mode.",
+    )
     arg_parser.add_argument(
         "--max-pages",
         default=None,
         type=int,
         help="Maximum number of pages to crawl. Useful for large sites.",
     )
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        default=1,
+        type=int,
+        help="Number of pages to fetch and analyze concurrently.",
+    )
+    arg_parser.add_argument(
+        "--parse-workers",
+        default=0,
+        type=int,
+        help="Number of processes used to parse fetched pages (0 parses in the fetching threads).",
+    )
+
+    arg_parser.add_argument(
+        "--low-memory",
+        default=False,
+        action="store_true",
+        help="Drop each page's word counts and n-grams once they are added to the site totals.",
+    )
+
+    arg_parser.add_argument(
+        "--top-k",
+        default=None,
+        type=int,
+        help="Only report the K most common keywords.",
+    )
+    arg_parser.add_argument(
+        "--min-count",
+        default=5,
+        type=int,
+        help="Minimum number of occurrences for a keyword to be reported.",
+    )
+
+    arg_parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory to cache responses in. Cached pages are revalidated with ETag/Last-Modified on the next run.",
+    )
+
+    arg_parser.add_argument(
+        "--user-agent",
+        default=None,
+        help="User-Agent header to send with every request.",
+    )
+    arg_parser.add_argument(
+        "--max-body-size",
+        default=None,
+        type=int,
+        help="Maximum number of bytes read from each page (default 10MB).",
+    )
+    arg_parser.add_argument(
+        "--store",
+        default=None,
+        help="SQLite file to keep analyzed pages in. Pages whose HTML has not changed since the last run are not analyzed again.",
+    )
+
+    arg_parser.add_argument(
+        "--skip-unchanged",
+        default=False,
+        action="store_true",
+        help="Reuse the stored analysis of sitemap urls whose lastmod has not changed since the last run, without fetching them. Needs --store.",
+    )
+    arg_parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="File to periodically save the crawl state to, so an interrupted crawl can be resumed.",
+    )
+    arg_parser.add_argument(
+        "--checkpoint-every",
+        default=100,
+        type=int,
+        help="Number of pages crawled between two checkpoints.",
+    )
+    arg_parser.add_argument(
+        "--resume",
+        default=False,
+        action="store_true",
+        help="Continue the crawl from the last checkpoint saved to --checkpoint.",
+    )
+
+    arg_parser.add_argument(
+        "--strip-tracking-params",
+        default=False,
+        action="store_true",
+        help="Drop tracking query parameters (utm_*, gclid, fbclid, ...) from links before crawling them.",
+    )
+    arg_parser.add_argument(
+        "--sort-query-params",
+        default=False,
+        action="store_true",
+        help="Treat links whose query parameters only differ in order as the same page.",
+    )
+
+    arg_parser.add_argument(
+        "--seen-set",
+        default="fingerprint",
+        choices=["exact", "fingerprint", "bloom"],
+        help="How seen urls are remembered: full strings, 64 bit fingerprints or a Bloom filter.",
+    )
+    arg_parser.add_argument(
+        "--seen-set-capacity",
+        default=1000000,
+        type=int,
+        help="Number of urls the Bloom filter is sized for.",
+    )
+    arg_parser.add_argument(
+        "--seen-set-error-rate",
+        default=0.001,
+        type=float,
+        help="False positive rate of the Bloom filter. A false positive skips a url that was never crawled.",
+    )
+
+    arg_parser.add_argument(
+        "--rate-limit",
+        default=None,
+        type=float,
+        help="Maximum number of requests per second to each host.",
+    )
+    arg_parser.add_argument(
+        "--max-per-host",
+        default=None,
+        type=int,
+        help="Maximum number of concurrent requests to each host.",
+    )
+    arg_parser.add_argument(
+        "--ignore-crawl-delay",
+        default=True,
+        action="store_false",
+        help="Ignore the Crawl-delay in the site's robots.txt.",
+    )
+    arg_parser.add_argument(
+        "--max-crawl-delay",
+        default=MAX_CRAWL_DELAY,
+        type=float,
+        help="Longest robots.txt Crawl-delay honoured, in seconds (default 60).",
+    )
+
+    arg_parser.add_argument(
+        "--ignore-robots",
+        default=True,
+        action="store_false",
+        help="Also crawl urls that the site's robots.txt disallows.",
+    )
 
     args = arg_parser.parse_args()
 
-    output = analyze(
-        args.site,
-        args.sitemap,
+    if args.resume and not args.checkpoint:
+        arg_parser.error("--resume requires --checkpoint")
+
+    if args.skip_unchanged and not args.store:
+        arg_parser.error("--skip-unchanged requires --store")
+
+    options = dict(
         analyze_headings=args.analyze_headings,
         analyze_extra_tags=args.analyze_extra_tags,
         follow_links=args.no_follow_links,
         run_llm_analysis=args.run_llm_analysis,
         max_pages=args.max_pages,
+        workers=args.jobs,
+        parse_workers=args.parse_workers,
+        low_memory=args.low_memory,
+        top_k=args.top_k,
+        min_count=args.min_count,
+        cache_dir=args.cache_dir,
+        store_path=args.store,
+        checkpoint_path=args.checkpoint,
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        strip_tracking_params=args.strip_tracking_params,
+        sort_query_params=args.sort_query_params,
+        seen_set=args.seen_set,
+        seen_set_capacity=args.seen_set_capacity,
+        seen_set_error_rate=args.seen_set_error_rate,
+        rate_limit=args.rate_limit,
+        max_per_host=args.max_per_host,
+        respect_crawl_delay=args.ignore_crawl_delay,
+        max_crawl_delay=args.max_crawl_delay,
+        respect_robots=args.ignore_robots,
+        skip_unchanged=args.skip_unchanged,
+        max_body_size=args.max_body_size,
+        user_agent=args.user_agent,
+        llm_concurrency=args.llm_concurrency,
+        llm_cache_dir=args.llm_cache_dir,
+        llm_cache_ttl=args.llm_cache_ttl,
+        llm_max_input_tokens=args.llm_max_input_tokens,
+        llm_mode=args.llm_mode,
+        llm_samples_per_group=args.llm_samples_per_group,
     )
 
+    if args.output_format == "ndjson":
+        # one line per page as soon as it is analyzed, then the site summary
+        for key, value in iter_analyze(args.site, args.sitemap, **options):
+            print(json.dumps({key: value}), flush=True)
+        return
+
+    output = analyze(args.site, args.sitemap, **options)
+
     if args.output_format == "html":
         from jinja2 import Environment
         from jinja2 import FileSystemLoader
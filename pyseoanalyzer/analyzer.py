@@ -1,5 +1,15 @@
+import inspect
 import time
-from operator import itemgetter
+from itertools import chain
+from .http import (
+    DEFAULT_MAX_BODY_SIZE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_USER_AGENT,
+    Http,
+)
+from .llm_analyst import DEFAULT_MAX_INPUT_TOKENS, LLM_CACHE_TTL
+from .ngrams import most_common, top_items
+from .politeness import MAX_CRAWL_DELAY
 from .website import Website
 
 
@@ -7,6 +17,53 @@ def calc_total_time(start_time):
     return time.time() - start_time
 
 
+def build_http(
+    http=None, cache_dir=None, max_body_size=None, user_agent=None, workers=1
+):
+    """
+    Returns the Http client to crawl with: `http` if one was passed in,
+    None if the shared default client will do, or else a new client with a
+    connection pool large enough for `workers` concurrent requests
+    """
+    if http is not None:
+        return http
+
+    if (
+        not cache_dir
+        and not max_body_size
+        and not user_agent
+        and workers <= DEFAULT_POOL_SIZE
+    ):
+        return None
+
+    return Http(
+        cache_dir=cache_dir,
+        max_body_size=max_body_size or DEFAULT_MAX_BODY_SIZE,
+        user_agent=user_agent or DEFAULT_USER_AGENT,
+        pool_size=max(workers, DEFAULT_POOL_SIZE),
+    )
+
+
+HTTP_OPTIONS = ("http", "cache_dir", "max_body_size", "user_agent")
+
+
+def build_site(options, connections=None):
+    """
+    Returns the Website to crawl with, for the arguments of analyze().
+    The client keeps `connections` connections to a host, by default one
+    per worker.
+    """
+    options = dict(options)
+    url = options.pop("url")
+    sitemap_url = options.pop("sitemap_url")
+    http = build_http(
+        *(options.pop(name) for name in HTTP_OPTIONS),
+        workers=connections or options["workers"],
+    )
+
+    return Website(base_url=url, sitemap=sitemap_url, http=http, **options)
+
+
 def analyze(
     url,
     sitemap_url=None,
@@ -15,78 +72,201 @@ def analyze(
     follow_links=True,
     run_llm_analysis=False,
     max_pages=None,
+    *,
+    workers=1,
+    parse_workers=0,
+    low_memory=False,
+    top_k=None,
+    min_count=5,
+    cache_dir=None,
+    store_path=None,
+    checkpoint_path=None,
+    checkpoint_every=100,
+    resume=False,
+    strip_tracking_params=False,
+    sort_query_params=False,
+    seen_set="fingerprint",
+    seen_set_capacity=1000000,
+    seen_set_error_rate=0.001,
+    rate_limit=None,
+    max_per_host=None,
+    respect_crawl_delay=True,
+    max_crawl_delay=MAX_CRAWL_DELAY,
+    respect_robots=True,
+    skip_unchanged=False,
+    max_body_size=None,
+    http=None,
+    user_agent=None,
+    llm_concurrency=4,
+    llm_cache_dir=None,
+    llm_cache_ttl=LLM_CACHE_TTL,
+    llm_max_input_tokens=DEFAULT_MAX_INPUT_TOKENS,
+    llm_mode="page",
+    llm_samples_per_group=2,
 ):
+    """
+    Crawl and analyze a site, returns the pages and the site-level results.
+    The http options (`http`, `cache_dir`, `max_body_size`, `user_agent`)
+    build the client, all others are passed on to Website.
+    """
+    options = dict(locals())
+    start_time = time.time()
+
+    site = build_site(options)
+    site.crawl()
+
+    return build_output(site, start_time, top_k, min_count)
+
+
+# Every option of analyze(), analyze_async() and iter_analyze() with its
+# default
+DEFAULT_OPTIONS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(analyze).parameters.items()
+    if name not in ("url", "sitemap_url")
+}
+
+
+def analyze_signature(**defaults):
+    """
+    The signature of analyze(), with `defaults` replacing some of its
+    defaults. The other entry points take the same arguments.
+    """
+    signature = inspect.signature(analyze)
+
+    return signature.replace(
+        parameters=[
+            parameter.replace(default=defaults.get(name, parameter.default))
+            for name, parameter in signature.parameters.items()
+        ]
+    )
+
+
+def bind_options(function, *args, **kwargs):
+    """
+    Returns the arguments of a call to an entry point by name, defaults
+    included. Unknown options raise a TypeError, as they would for
+    analyze().
+    """
+    bound = inspect.signature(function).bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    return bound.arguments
+
+
+async def analyze_async(*args, **kwargs):
+    """
+    Awaitable version of analyze() for use inside an existing event loop.
+    `workers` is the number of pages kept in flight at once, 100 by
+    default.
+    """
+    options = bind_options(analyze_async, *args, **kwargs)
+    start_time = time.time()
+
+    # pages in flight are cheap on the event loop, requests are not: each
+    # takes an I/O thread and a connection, as many as max_per_host allows
+    connections = min(
+        options["workers"], options["max_per_host"] or DEFAULT_POOL_SIZE
+    )
+    site = build_site(options, connections)
+    await site.crawl_async()
+
+    return build_output(site, start_time, options["top_k"], options["min_count"])
+
+
+analyze_async.__signature__ = analyze_signature(workers=100)
+
+
+def iter_analyze(*args, **kwargs):
+    """
+    Streaming version of analyze(). Yields ("page", page_dict) as soon as
+    each page is analyzed, then one (key, value) pair for each site-level
+    summary (keywords, errors, total_time, ai_crawler_access,
+    duplicate_pages, near_duplicate_pages) once the crawl is done. Analyzed
+    pages are not kept in memory. With `run_llm_analysis`, each page's LLM
+    analysis follows later as ("llm_analysis", {"url", "llm_analysis"}).
+    """
+    options = bind_options(iter_analyze, *args, **kwargs)
     start_time = time.time()
 
+    site = build_site(options)
+
+    try:
+        for page in site.iter_crawl():
+            yield "page", page.as_dict()
+
+            for analyzed in site.iter_llm_results():
+                yield "llm_analysis", llm_event(analyzed)
+
+        for analyzed in site.iter_llm_results(block=True):
+            yield "llm_analysis", llm_event(analyzed)
+
+        site.finish_llm_analysis()
+    finally:
+        site.close()
+
+    summary = summarize_site(site, start_time, options["top_k"], options["min_count"])
+    for key, value in summary.items():
+        yield key, value
+
+
+iter_analyze.__signature__ = analyze_signature()
+
+
+def llm_event(page):
+    return {"url": page.url, "llm_analysis": page.llm_analysis}
+
+
+def build_output(site, start_time, top_k=None, min_count=5):
     output = {
-        "pages": [],
+        "pages": [p.as_dict() for p in site.crawled_pages],
+    }
+
+    output.update(summarize_site(site, start_time, top_k, min_count))
+
+    return output
+
+
+def summarize_site(site, start_time, top_k=None, min_count=5):
+    """
+    Returns the site-level results of a finished crawl. `keywords` holds the
+    `top_k` most common words, bigrams and trigrams (all of them if None)
+    seen at least `min_count` times.
+    """
+    summary = {
         "keywords": [],
         "errors": [],
         "total_time": 0,  # Initialize to 0 before calculation
         "ai_crawler_access": {},
     }
 
-    site = Website(
-        base_url=url,
-        sitemap=sitemap_url,
-        analyze_headings=analyze_headings,
-        analyze_extra_tags=analyze_extra_tags,
-        follow_links=follow_links,
-        run_llm_analysis=run_llm_analysis,
-        max_pages=max_pages,
-    )
-
-    site.crawl()
+    summary["ai_crawler_access"] = site.ai_crawler_access
 
-    output["ai_crawler_access"] = site.ai_crawler_access
-
-    for p in site.crawled_pages:
-        output["pages"].append(p.as_dict())
-
-    output["duplicate_pages"] = [
+    summary["duplicate_pages"] = [
         list(site.content_hashes[p])
         for p in site.content_hashes
         if len(site.content_hashes[p]) > 1
     ]
 
-    sorted_words = sorted(site.wordcount.items(), key=itemgetter(1), reverse=True)
-    sorted_bigrams = sorted(site.bigrams.items(), key=itemgetter(1), reverse=True)
-    sorted_trigrams = sorted(site.trigrams.items(), key=itemgetter(1), reverse=True)
-
-    output["keywords"] = []
-
-    for w in sorted_words:
-        if w[1] > 4:
-            output["keywords"].append(
-                {
-                    "word": w[0],
-                    "count": w[1],
-                }
-            )
-
-    for w, v in sorted_bigrams:
-        if v > 4:
-            output["keywords"].append(
-                {
-                    "word": w,
-                    "count": v,
-                }
-            )
-
-    for w, v in sorted_trigrams:
-        if v > 4:
-            output["keywords"].append(
-                {
-                    "word": w,
-                    "count": v,
-                }
-            )
-
-    # Sort one last time...
-    output["keywords"] = sorted(
-        output["keywords"], key=itemgetter("count"), reverse=True
+    summary["near_duplicate_pages"] = site.near_duplicates.clusters()
+
+    # only counts that made the cut are ever ranked or turned into strings
+    candidates = chain.from_iterable(
+        most_common(counts, top_k, min_count=min_count)
+        for counts in (site.wordcount, site.bigrams, site.trigrams)
     )
 
-    output["total_time"] = calc_total_time(start_time)
+    summary["keywords"] = [
+        {
+            "word": w,
+            "count": v,
+        }
+        for w, v in top_items(candidates, top_k)
+    ]
 
-    return output
+    if site.site_llm_analysis is not None:
+        summary["llm_analysis"] = site.site_llm_analysis
+
+    summary["total_time"] = calc_total_time(start_time)
+
+    return summary
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from threading import Lock
+
+
+class DiskCache:
+    """
+    Size-bounded on-disk key/value store.
+
+    Each entry is a small JSON metadata file plus a body file, named after
+    the SHA-256 of the key. Reading an entry touches it, and once the total
+    size of the cache goes over `max_size` bytes the least recently used
+    entries are evicted. With a `ttl`, entries older than `ttl` seconds
+    are treated as missing and removed when they are read.
+    """
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024, ttl=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.size = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.is_file()
+        )
+
+    def path(self, key, suffix):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.{suffix}")
+
+    def get(self, key):
+        """
+        Returns (metadata, body) for a key, or None if it is not cached
+        """
+        meta_path, body_path = self.path(key, "json"), self.path(key, "body")
+
+        # the body is written once per entry, its modification time is the
+        # time the entry was stored
+        if self.ttl is not None and self._expired(body_path):
+            self.delete(key)
+            return None
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                metadata = json.load(meta_file)
+            with open(body_path, "rb") as body_file:
+                body = body_file.read()
+        except (OSError, ValueError):
+            return None
+
+        # the modification time doubles as the last access time for eviction
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+        return metadata, body
+
+    def set(self, key, metadata, body):
+        meta_path, body_path = self.path(key, "json"), self.path(key, "body")
+
+        with self.lock:
+            self.size -= self._file_size(meta_path) + self._file_size(body_path)
+            self._write(body_path, body)
+            self._write(meta_path, json.dumps(metadata).encode("utf-8"))
+            self.size += self._file_size(meta_path) + self._file_size(body_path)
+
+            if self.size > self.max_size:
+                self.evict()
+
+    def delete(self, key):
+        with self.lock:
+            for path in (self.path(key, "json"), self.path(key, "body")):
+                self.size -= self._file_size(path)
+                self._remove(path)
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in
+        `max_size` again. Must be called with the lock held.
+        """
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".json")
+        )
+
+        for _, meta_path in entries:
+            if self.size <= self.max_size:
+                break
+
+            body_path = meta_path[: -len(".json")] + ".body"
+
+            for path in (meta_path, body_path):
+                self.size -= self._file_size(path)
+                self._remove(path)
+
+    def _expired(self, path):
+        try:
+            return os.path.getmtime(path) + self.ttl < time.time()
+        except OSError:
+            return False
+
+    def _write(self, path, data):
+        # write to a temporary file first so readers never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+    def _file_size(self, path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,226 @@
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only track where a visitor came from and never
+# change the page that is served.
+TRACKING_PARAMS = {
+    "_ga",
+    "_gl",
+    "dclid",
+    "fbclid",
+    "gclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "msclkid",
+    "yclid",
+}
+
+TRACKING_PARAM_PREFIXES = ("utm_",)
+
+
+def remove_dot_segments(path):
+    """
+    Resolve "." and ".." segments of a path as in RFC 3986, section 5.2.4
+    """
+    if "." not in path:
+        return path
+
+    segments = []
+
+    for segment in path.split("/"):
+        if segment == "..":
+            if len(segments) > 1:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+
+    # a trailing "." or ".." still refers to a directory
+    if path.endswith(("/.", "/..")):
+        segments.append("")
+
+    return "/".join(segments) or "/"
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def normalize_url(url, base=None, strip_tracking=False, sort_query=False):
+    """
+    Returns the canonical form of a url, resolved against `base` if given.
+
+    The scheme and host are lower cased, default ports, dot segments and
+    the fragment are removed, and an empty path becomes "/". Tracking
+    parameters (utm_*, gclid, ...) can be stripped and the remaining query
+    parameters sorted, so equivalent urls compare equal. Urls that are not
+    http(s) are returned as they are.
+    """
+    url = url.strip()
+
+    if base:
+        url = urljoin(base, url)
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+
+    if scheme not in DEFAULT_PORTS:
+        return url
+
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+
+    netloc = host
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo = f"{userinfo}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+
+    path = remove_dot_segments(parts.path) or "/"
+    query = parts.query
+
+    if query and (strip_tracking or sort_query):
+        params = parse_qsl(query, keep_blank_values=True)
+        if strip_tracking:
+            params = [(k, v) for k, v in params if not is_tracking_param(k)]
+        if sort_query:
+            params.sort()
+        query = urlencode(params)
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class Frontier:
+    """
+    Queue of urls still to be crawled.
+
+    Urls are normalized once when they are added, and each normalized url
+    is admitted only the first time it is seen. The queue therefore grows
+    with the number of unique urls, not with the number of links found.
+    `seen` is any set-like object with `in` and add(), see seen.py.
+
+    Sources added with add_source() (such as a sitemap being parsed) are
+    read lazily, one url at a time, and are crawled before the urls added
+    one by one.
+    """
+
+    def __init__(self, strip_tracking=False, sort_query=False, seen=None):
+        self.strip_tracking = strip_tracking
+        self.sort_query = sort_query
+        self.queue = deque()
+        self.seen = seen if seen is not None else set()
+        self.sources = deque()
+        self.head = None
+
+    def __len__(self):
+        return len(self.queue) + (self.head is not None)
+
+    def __bool__(self):
+        if self.head is None:
+            self.head = self._next_from_sources()
+        return self.head is not None or bool(self.queue)
+
+    def __iter__(self):
+        return iter(self.queue)
+
+    def normalize(self, url):
+        return normalize_url(
+            url, strip_tracking=self.strip_tracking, sort_query=self.sort_query
+        )
+
+    def admit(self, url):
+        """
+        Returns the normalized url if it was not seen before, else None
+        """
+        if not url or not url.strip():
+            return None
+
+        url = self.normalize(url)
+
+        if url in self.seen:
+            return None
+
+        self.seen.add(url)
+        return url
+
+    def add(self, url):
+        """
+        Queue a url unless an equivalent url was queued before. Returns
+        True if it was admitted.
+        """
+        url = self.admit(url)
+
+        if url is None:
+            return False
+
+        self.queue.append(url)
+        return True
+
+    def add_source(self, urls):
+        """
+        Queue the urls of an iterable as they are needed
+        """
+        self.sources.append(iter(urls))
+
+    def drain(self):
+        """
+        Read every source to the end and queue their urls in front of the
+        others, so the frontier holds plain data only (to be pickled)
+        """
+        urls = []
+
+        if self.head is not None:
+            urls.append(self.head)
+            self.head = None
+
+        while True:
+            url = self._next_from_sources()
+            if url is None:
+                break
+            urls.append(url)
+
+        self.queue.extendleft(reversed(urls))
+
+    def extend(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def requeue(self, urls):
+        """
+        Queue already seen urls again, in front of the others. Used for
+        pages that were in flight when a crawl was interrupted.
+        """
+        self.queue.extendleft(reversed(list(urls)))
+
+    def pop(self):
+        if self.head is None:
+            self.head = self._next_from_sources()
+
+        if self.head is not None:
+            url, self.head = self.head, None
+            return url
+
+        return self.queue.popleft()
+
+    def _next_from_sources(self):
+        while self.sources:
+            for url in self.sources[0]:
+                url = self.admit(url)
+                if url is not None:
+                    return url
+            self.sources.popleft()
+
+        return None
@@ -1,21 +1,291 @@
+import asyncio
 import certifi
+import io
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from urllib3 import HTTPHeaderDict
 from urllib3 import PoolManager
+from urllib3 import Retry
 from urllib3 import Timeout
 
+from .cache import DiskCache
+
+
+# Bodies are read in chunks of this size and never beyond the maximum body
+# size, so a huge or endless response can't exhaust memory.
+READ_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_BODY_SIZE = 10 * 1024 * 1024
+
+DEFAULT_USER_AGENT = "Mozilla/5.0"
+# connections kept alive per host
+DEFAULT_POOL_SIZE = 10
+# hosts connections are kept alive for: the site, its CDNs and the hosts
+# of the robots.txt and sitemaps
+DEFAULT_NUM_POOLS = 10
+
+
+class Response:
+    """
+    A response whose body has been read. `data` is always bytes, empty if
+    the body was empty or not wanted, and `truncated` is set if it was cut
+    short.
+    """
+
+    __slots__ = ("url", "status", "headers", "data", "truncated")
+
+    def __init__(self, url, status, headers, data=b"", truncated=False):
+        self.url = url
+        self.status = status
+        self.headers = HTTPHeaderDict(headers)
+        self.data = data
+        self.truncated = truncated
+
+
+class BodyReader(io.RawIOBase):
+    """
+    Reads the decompressed body of a streamed urllib3 response, stopping
+    after `max_size` bytes
+    """
+
+    def __init__(self, response, max_size=None):
+        self.response = response
+        self.remaining = max_size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer)
+
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+
+        data = self.response.read(size, decode_content=True) if size else b""
+        buffer[: len(data)] = data
+
+        if self.remaining is not None:
+            self.remaining -= len(data)
+
+        return len(data)
+
 
 class Http:
-    def __init__(self):
-        user_agent = {"User-Agent": "Mozilla/5.0"}
+    """
+    HTTP client for the crawl, a thin layer over a urllib3 PoolManager.
+
+    `pool_size` connections are kept alive per host and reused between
+    requests, so it should be at least the number of concurrent requests
+    to a host. Connections are kept for the last `num_pools` hosts. With `pool_block` a request waits for a free connection
+    instead of opening one that is thrown away afterwards. Connection
+    errors and timeouts are retried `retries` times, with an exponential
+    `backoff_factor`; rate limiting responses are left to the politeness
+    scheduler.
+    """
 
+    def __init__(
+        self,
+        cache_dir=None,
+        cache_max_size=1024 * 1024 * 1024,
+        max_body_size=DEFAULT_MAX_BODY_SIZE,
+        user_agent=DEFAULT_USER_AGENT,
+        connect_timeout=2.0,
+        read_timeout=7.0,
+        pool_size=DEFAULT_POOL_SIZE,
+        num_pools=DEFAULT_NUM_POOLS,
+        pool_block=False,
+        retries=3,
+        backoff_factor=0.5,
+    ):
+        self.user_agent = user_agent or DEFAULT_USER_AGENT
         self.http = PoolManager(
-            timeout=Timeout(connect=2.0, read=7.0),
+            num_pools=num_pools,
+            maxsize=pool_size,
+            block=pool_block,
+            timeout=Timeout(connect=connect_timeout, read=read_timeout),
+            retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                raise_on_redirect=False,
+                raise_on_status=False,
+            ),
             cert_reqs="CERT_REQUIRED",
             ca_certs=certifi.where(),
-            headers=user_agent,
+            headers={"User-Agent": self.user_agent},
         )
 
-    def get(self, url):
-        return self.http.request("GET", url)
+        self.cache = DiskCache(cache_dir, cache_max_size) if cache_dir else None
+        self.max_body_size = max_body_size
+        self.pool_size = pool_size
+
+    def get(self, url, content_types=None, max_size=None):
+        """
+        GET a url. With `content_types`, a response whose Content-Type
+        contains none of them is returned without its body. `max_size`
+        overrides `max_body_size` for this request.
+        """
+        if self.cache is None:
+            return self.request(url, content_types=content_types, max_size=max_size)
+
+        return self.cached_get(url, content_types, max_size)
+
+    def request(self, url, headers=None, content_types=None, max_size=None):
+        """
+        GET a url, streaming the body. The headers are checked before any of
+        the body is read, and at most `max_body_size` bytes are read.
+        Returns a Response.
+        """
+        response = self.http.request(
+            "GET", url, headers=headers, preload_content=False
+        )
+        body = b""
+        truncated = False
+
+        try:
+            content_type = response.headers.get("Content-Type", "")
+
+            if not content_types or not content_type or any(
+                t in content_type for t in content_types
+            ):
+                body, truncated = self.read_body(
+                    response, max_size or self.max_body_size
+                )
+        finally:
+            if truncated or not response.isclosed():
+                # the rest of the body is not wanted, drop the connection
+                # instead of reading it to the end
+                response.close()
+            response.release_conn()
+
+        return Response(url, response.status, response.headers, body, truncated)
+
+    @contextmanager
+    def stream(self, url, max_size=None):
+        """
+        GET a url without reading the body up front, for bodies too large
+        to hold in memory. Yields the Response, without its data, and a
+        buffered binary file object reading at most `max_size` bytes of the
+        body (`max_body_size` by default).
+        """
+        response = self.http.request("GET", url, preload_content=False)
+
+        try:
+            yield (
+                Response(url, response.status, response.headers),
+                io.BufferedReader(
+                    BodyReader(response, max_size or self.max_body_size),
+                    READ_CHUNK_SIZE,
+                ),
+            )
+        finally:
+            if not response.isclosed():
+                response.close()
+            response.release_conn()
+
+    def read_body(self, response, max_size=None):
+        """
+        Returns the (decompressed) body and whether it had to be truncated
+        """
+        chunks = []
+        size = 0
+
+        for chunk in response.stream(READ_CHUNK_SIZE, decode_content=True):
+            chunks.append(chunk)
+            size += len(chunk)
+
+            if max_size and size > max_size:
+                return b"".join(chunks)[:max_size], True
+
+        return b"".join(chunks), False
+
+    def cached_get(self, url, content_types=None, max_size=None):
+        """
+        GET through the response cache. A cached response is revalidated
+        with If-None-Match / If-Modified-Since and reused on a 304, so an
+        unchanged page costs a round trip but no body.
+        """
+        cached = self.cache.get(url)
+        headers = dict(self.http.headers)
+
+        if cached is not None:
+            metadata, body = cached
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        response = self.request(
+            url, headers=headers, content_types=content_types, max_size=max_size
+        )
+
+        if response.status == 304 and cached is not None:
+            return Response(
+                url,
+                metadata["status"],
+                metadata["headers"],
+                body,
+                metadata.get("truncated", False),
+            )
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        # only complete responses that can be revalidated are worth keeping
+        if response.status == 200 and response.data and (etag or last_modified):
+            self.cache.set(
+                url,
+                {
+                    "url": url,
+                    "status": response.status,
+                    "headers": dict(response.headers),
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "truncated": response.truncated,
+                },
+                response.data,
+            )
+        elif cached is not None and response.status != 304:
+            self.cache.delete(url)
+
+        return response
+
+
+class AsyncHttp:
+    """
+    Awaitable front end for an `Http` client.
+
+    urllib3 has no asyncio transport, so each request runs on a dedicated
+    pool of `max_connections` I/O threads, by default one per connection
+    the client keeps to a host. More requests than that can be awaited at
+    once, they wait for a free thread without blocking the event loop.
+    """
+
+    def __init__(self, client=None, max_connections=None):
+        self.client = client or http
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_connections
+            or getattr(self.client, "pool_size", DEFAULT_POOL_SIZE),
+            thread_name_prefix="pyseoanalyzer-http",
+        )
+        self.pending = set()
+
+    async def get(self, url, **kwargs):
+        future = self.executor.submit(partial(self.client.get, url, **kwargs))
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        """
+        Stop the I/O threads. Requests that have not started are dropped.
+        """
+        for future in list(self.pending):
+            future.cancel()
+
+        self.executor.shutdown(wait=False)
 
 
 http = Http()
+async_http = AsyncHttp(http)
@@ -4,15 +4,55 @@ from langchain.prompts import PromptTemplate
 from langchain.schema.runnable import RunnablePassthrough
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
+from threading import Lock, Thread
 from typing import Dict, List, Optional
 
 import asyncio
+import hashlib
 import json
 import os
 
+from .cache import DiskCache
+
 load_dotenv()
 
 
+# chain results cached on disk are reused for a week by default
+LLM_CACHE_TTL = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_SIZE = 100 * 1024 * 1024
+
+# Payloads are measured in estimated tokens, about four characters each
+# for English text. Good enough to keep requests to a predictable size
+# without a tokenizer dependency.
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_INPUT_TOKENS = 4000
+
+# the fields of a page the prompts make use of, anything else is dropped
+PAYLOAD_PAGE_FIELDS = (
+    "url",
+    "title",
+    "description",
+    "author",
+    "sitename",
+    "date",
+    "word_count",
+    "headings",
+    "additional_info",
+    "keywords",
+    "warnings",
+    "text",
+    "comments",
+)
+PAYLOAD_SITE_FIELDS = ("keywords", "ai_crawler_access", "duplicate_pages", "errors")
+# fields kept for each page of a site
+PAYLOAD_SITE_PAGE_FIELDS = ("url", "title", "description", "word_count")
+
+# long text fields are cut first, least useful first
+PAYLOAD_TEXT_FIELDS = ("comments", "text")
+PAYLOAD_LIST_LIMIT = 20
+TRUNCATION_MARK = " [...]"
+
+
 # Pydantic models for structured output
 class EntityAnalysis(BaseModel):
     entity_assessment: str = Field(
@@ -56,8 +96,121 @@ class SEORecommendations(BaseModel):
     )
 
 
+def compact_json(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_text(text, max_chars):
+    """
+    Cut `text` to at most `max_chars` characters, at a word boundary when
+    there is one, marking the cut
+    """
+    if len(text) <= max_chars:
+        return text
+
+    max_chars -= len(TRUNCATION_MARK)
+    if max_chars <= 0:
+        return ""
+
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+
+    return cut.rstrip() + TRUNCATION_MARK
+
+
+def _limit(value, limit=PAYLOAD_LIST_LIMIT):
+    if isinstance(value, list):
+        return value[:limit]
+    if isinstance(value, dict):
+        return {key: _limit(item, limit) for key, item in value.items()}
+    return value
+
+
+def select_payload_fields(seo_data):
+    """
+    The part of a page's or a site's results the prompts use. Lists are
+    capped at PAYLOAD_LIST_LIMIT items, a site's pages are reduced to
+    their url, title, description and word count.
+    """
+    if "pages" in seo_data:
+        payload = {
+            field: _limit(seo_data[field])
+            for field in PAYLOAD_SITE_FIELDS
+            if seo_data.get(field)
+        }
+        payload["pages"] = [
+            {field: page[field] for field in PAYLOAD_SITE_PAGE_FIELDS if field in page}
+            for page in seo_data["pages"]
+        ]
+        return payload
+
+    return {
+        field: _limit(seo_data[field])
+        for field in PAYLOAD_PAGE_FIELDS
+        if seo_data.get(field)
+    }
+
+
+def build_llm_payload(seo_data, max_tokens=DEFAULT_MAX_INPUT_TOKENS):
+    """
+    Serialize `seo_data` for a prompt in at most about `max_tokens` tokens.
+
+    Only the fields the prompts use are kept and the JSON is compact. If
+    that is still too long the page text is truncated, comments first, and
+    then pages are dropped from the end of a site's page list. The result
+    only depends on the input, so identical pages give identical payloads
+    and hit the LLM cache.
+    """
+    payload = select_payload_fields(seo_data)
+    budget = max_tokens * CHARS_PER_TOKEN
+    data = compact_json(payload)
+
+    for field in PAYLOAD_TEXT_FIELDS:
+        while len(data) > budget and payload.get(field):
+            text = payload[field]
+            payload[field] = truncate_text(text, len(text) - (len(data) - budget))
+            data = compact_json(payload)
+
+    pages = payload.get("pages")
+
+    if len(data) > budget and pages:
+        # pages are listed in crawl order, the first ones matter most
+        total = len(pages)
+        while len(data) > budget and pages:
+            pages.pop()
+            payload["omitted_pages"] = total - len(pages)
+            data = compact_json(payload)
+
+    return data
+
+
 class LLMSEOEnhancer:
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_ttl: Optional[float] = LLM_CACHE_TTL,
+        cache_max_size: int = LLM_CACHE_MAX_SIZE,
+        max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS,
+    ):
+        # at most `max_concurrency` chains are waiting on the model at once
+        self.max_concurrency = max_concurrency
+        # the page data sent to each chain is cut down to this many tokens
+        self.max_input_tokens = max_input_tokens
+        self._semaphore = None
+        # chain results keyed by model, chain, prompt and input, see
+        # _cache_key()
+        self.cache = (
+            DiskCache(cache_dir, cache_max_size, ttl=cache_ttl) if cache_dir else None
+        )
+        self.parsers = {}
+        self.prompt_hashes = {}
         self.llm = ChatAnthropic(
             model="claude-3-sonnet-20240229",
             anthropic_api_key=os.environ.get("ANTHROPIC_API_KEY"),
@@ -98,6 +251,7 @@ class LLMSEOEnhancer:
             | self.llm
             | entity_parser
         )
+        self._register_chain("entity", entity_prompt, entity_parser)
 
         # Credibility Analysis Chain
         credibility_parser = PydanticOutputParser(pydantic_object=CredibilityAnalysis)
@@ -128,6 +282,7 @@ class LLMSEOEnhancer:
             | self.llm
             | credibility_parser
         )
+        self._register_chain("credibility", credibility_prompt, credibility_parser)
 
         # Conversation Analysis Chain
         conversation_parser = PydanticOutputParser(pydantic_object=ConversationAnalysis)
@@ -158,6 +313,7 @@ class LLMSEOEnhancer:
             | self.llm
             | conversation_parser
         )
+        self._register_chain("conversation", conversation_prompt, conversation_parser)
 
         # Platform Presence Chain
         platform_parser = PydanticOutputParser(pydantic_object=PlatformPresence)
@@ -188,6 +344,7 @@ class LLMSEOEnhancer:
             | self.llm
             | platform_parser
         )
+        self._register_chain("platform", platform_prompt, platform_parser)
 
         # Recommendations Chain
         recommendations_parser = PydanticOutputParser(
@@ -220,67 +377,192 @@ class LLMSEOEnhancer:
             | self.llm
             | recommendations_parser
         )
+        self._register_chain(
+            "recommendations", recommendations_prompt, recommendations_parser
+        )
 
     async def enhance_seo_analysis(self, seo_data: Dict) -> Dict:
         """
         Enhanced SEO analysis using modern LangChain patterns
         """
-        # Convert seo_data to string for prompt insertion
-        seo_data_str = json.dumps(seo_data, indent=2)
+        combined_analysis = await self._analyze_page(seo_data)
+
+        # Generate final recommendations
+        recommendations = await self._ainvoke(
+            "recommendations", compact_json(combined_analysis)
+        )
+
+        # Combine all results
+        final_results = {
+            **seo_data,
+            **combined_analysis,
+            "recommendations": recommendations.model_dump(),
+        }
+
+        return self._format_output(final_results)
+
+    async def enhance_site_analysis(self, groups: Dict[str, List[Dict]]) -> Dict:
+        """
+        Site-level analysis over groups of similar pages. `groups` maps each
+        group to the content of a few sample pages. The analysis chains run
+        on every sample and a single recommendations pass covers the whole
+        site, so the number of model calls grows with the number of groups
+        rather than the number of pages.
+
+        A sample whose analysis fails is left out of its group. A group with
+        no successful sample gets an "error" entry instead of a summary, and
+        without any successful group there are no recommendations (None).
+        """
+        samples = [
+            (name, seo_data) for name, pages in groups.items() for seo_data in pages
+        ]
+        analyses = await asyncio.gather(
+            *(self._analyze_page(seo_data) for _, seo_data in samples),
+            return_exceptions=True,
+        )
+
+        results = {}
+        errors = {}
+        for (name, seo_data), analysis in zip(samples, analyses):
+            if isinstance(analysis, Exception):
+                errors.setdefault(name, str(analysis))
+                continue
+
+            group = results.setdefault(name, {"sampled_urls": [], "analyses": []})
+            group["sampled_urls"].append(seo_data.get("url"))
+            group["analyses"].append(analysis)
+
+        for group in results.values():
+            scores = [self._scores(analysis) for analysis in group["analyses"]]
+            group["summary"] = {
+                key: sum(score[key] for score in scores) / len(scores)
+                for key in scores[0]
+            }
+
+        # the recommendations only see what each group needs, not every
+        # sample's full analysis
+        overview = {
+            name: {
+                "summary": group["summary"],
+                "improvements": sorted(
+                    {
+                        item
+                        for analysis in group["analyses"]
+                        for item in analysis["entity_analysis"]["key_improvements"]
+                        + analysis["conversation_analysis"]["gaps"]
+                    }
+                ),
+            }
+            for name, group in results.items()
+        }
+
+        recommendations = None
+        if overview:
+            recommendations = (
+                await self._ainvoke("recommendations", compact_json(overview))
+            ).model_dump()
+
+        for name, error in errors.items():
+            results.setdefault(name, {"error": error})
+
+        return {"groups": results, "recommendations": recommendations}
+
+    async def _analyze_page(self, seo_data: Dict) -> Dict:
+        """
+        Run the four analysis chains in parallel on one page
+        """
+        # Convert seo_data to a token-budgeted string for prompt insertion
+        seo_data_str = build_llm_payload(seo_data, self.max_input_tokens)
 
-        # Run analysis chains in parallel
         entity_results, credibility_results, conversation_results, platform_results = (
             await asyncio.gather(
-                self.entity_chain.ainvoke(seo_data_str),
-                self.credibility_chain.ainvoke(seo_data_str),
-                self.conversation_chain.ainvoke(seo_data_str),
-                self.platform_chain.ainvoke(seo_data_str),
+                self._ainvoke("entity", seo_data_str),
+                self._ainvoke("credibility", seo_data_str),
+                self._ainvoke("conversation", seo_data_str),
+                self._ainvoke("platform", seo_data_str),
             )
         )
 
-        # Combine analyses
-        combined_analysis = {
+        return {
             "entity_analysis": entity_results.model_dump(),
             "credibility_analysis": credibility_results.model_dump(),
             "conversation_analysis": conversation_results.model_dump(),
             "cross_platform_presence": platform_results.model_dump(),
         }
 
-        # Generate final recommendations
-        recommendations = await self.recommendations_chain.ainvoke(
-            json.dumps(combined_analysis, indent=2)
-        )
+    def _register_chain(self, name, prompt, parser):
+        self.parsers[name] = parser
+        self.prompt_hashes[name] = hashlib.sha256(
+            (prompt.template + parser.get_format_instructions()).encode("utf-8")
+        ).hexdigest()
 
-        # Combine all results
-        final_results = {
-            **seo_data,
-            **combined_analysis,
-            "recommendations": recommendations.model_dump(),
-        }
+    def _cache_key(self, name, data):
+        """
+        A chain's result only depends on the model, the prompt template
+        (format instructions included) and the data it is given
+        """
+        data_hash = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        return f"{self.llm.model}:{name}:{self.prompt_hashes[name]}:{data_hash}"
 
-        return self._format_output(final_results)
+    async def _ainvoke(self, name, data):
+        """
+        Run the chain called `name` on `data`, or return its cached result
+        without calling the model
+        """
+        parser = self.parsers[name]
+        key = self._cache_key(name, data) if self.cache is not None else None
+
+        if key is not None:
+            cached = self.cache.get(key)
+
+            if cached is not None:
+                try:
+                    return parser.pydantic_object.model_validate_json(cached[1])
+                except ValueError:
+                    self.cache.delete(key)
+
+        chain = getattr(self, f"{name}_chain")
+
+        if not self.max_concurrency:
+            result = await chain.ainvoke(data)
+        else:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async with self._semaphore:
+                result = await chain.ainvoke(data)
+
+        if key is not None:
+            self.cache.set(
+                key,
+                {"model": self.llm.model, "chain": name},
+                result.model_dump_json().encode("utf-8"),
+            )
+
+        return result
+
+    def _scores(self, raw_analysis: Dict) -> Dict:
+        return {
+            "entity_score": raw_analysis["entity_analysis"][
+                "knowledge_panel_readiness"
+            ],
+            "credibility_score": sum(
+                raw_analysis["credibility_analysis"]["neeat_scores"].values()
+            )
+            / 6,
+            "conversation_score": raw_analysis["conversation_analysis"][
+                "engagement_score"
+            ],
+            "platform_score": sum(
+                raw_analysis["cross_platform_presence"]["visibility_scores"].values()
+            )
+            / len(raw_analysis["cross_platform_presence"]["visibility_scores"]),
+        }
 
     def _format_output(self, raw_analysis: Dict) -> Dict:
         """Format analysis results into a clean, structured output"""
         return {
-            "summary": {
-                "entity_score": raw_analysis["entity_analysis"][
-                    "knowledge_panel_readiness"
-                ],
-                "credibility_score": sum(
-                    raw_analysis["credibility_analysis"]["neeat_scores"].values()
-                )
-                / 6,
-                "conversation_score": raw_analysis["conversation_analysis"][
-                    "engagement_score"
-                ],
-                "platform_score": sum(
-                    raw_analysis["cross_platform_presence"][
-                        "visibility_scores"
-                    ].values()
-                )
-                / len(raw_analysis["cross_platform_presence"]["visibility_scores"]),
-            },
+            "summary": self._scores(raw_analysis),
             "detailed_analysis": raw_analysis,
             "quick_wins": raw_analysis["recommendations"]["quick_wins"],
             "strategic_recommendations": raw_analysis["recommendations"][
@@ -289,12 +571,97 @@ class LLMSEOEnhancer:
         }
 
 
+class LLMStage:
+    """
+    Runs the LLM analysis of crawled pages in the background.
+
+    One LLMSEOEnhancer, and so one model client and one set of chains, is
+    shared by every page. Its event loop runs on a thread of its own: pages
+    are submitted as soon as they are parsed and the crawl moves on while
+    the model answers. At most `concurrency` model calls are in flight, and
+    with a `cache_dir` chain results are reused for `cache_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        enhancer=None,
+        cache_dir: Optional[str] = None,
+        cache_ttl: Optional[float] = LLM_CACHE_TTL,
+        max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS,
+    ):
+        self.concurrency = max(1, concurrency or 1)
+        self.enhancer = enhancer
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.max_input_tokens = max_input_tokens
+        self.loop = None
+        self.thread = None
+        self.lock = Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+
+            if self.enhancer is None:
+                self.enhancer = LLMSEOEnhancer(
+                    max_concurrency=self.concurrency,
+                    cache_dir=self.cache_dir,
+                    cache_ttl=self.cache_ttl,
+                    max_input_tokens=self.max_input_tokens,
+                )
+
+            self.loop = asyncio.new_event_loop()
+            self.thread = Thread(
+                target=self.loop.run_forever, name="llm-stage", daemon=True
+            )
+            self.thread.start()
+
+    def submit(self, seo_data: Dict):
+        """
+        Queue a page's content for analysis, returns a
+        concurrent.futures.Future of the enhanced analysis
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.enhancer.enhance_seo_analysis(seo_data), self.loop
+        )
+
+    def submit_site(self, groups: Dict[str, List[Dict]]):
+        """
+        Queue the site-level analysis of sampled page groups, see
+        LLMSEOEnhancer.enhance_site_analysis()
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.enhancer.enhance_site_analysis(groups), self.loop
+        )
+
+    def close(self):
+        with self.lock:
+            if self.loop is None:
+                return
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+
+
 # Example usage with async support
 async def enhanced_modern_analyze(
-    site: str, sitemap: Optional[str] = None, api_key: str = None, **kwargs
+    site: str,
+    sitemap: Optional[str] = None,
+    api_key: str = None,
+    max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS,
+    **kwargs,
 ):
     """
-    Enhanced analysis incorporating modern SEO principles using LangChain
+    Enhanced analysis incorporating modern SEO principles using LangChain.
+    The site results are condensed to `max_input_tokens` tokens before
+    they are sent to the model.
     """
     from pyseoanalyzer import analyze
 
@@ -303,8 +670,8 @@ async def enhanced_modern_analyze(
 
     # Enhance with modern SEO analysis if API key provided
     if api_key:
-        enhancer = LLMSEOEnhancer()
-        enhanced_results = await enhancer.enhance_seo_analysis(original_results)
-        return enhancer._format_output(enhanced_results)
+        enhancer = LLMSEOEnhancer(max_input_tokens=max_input_tokens)
+        # enhance_seo_analysis() already returns the formatted output
+        return await enhancer.enhance_seo_analysis(original_results)
 
     return original_results
@@ -0,0 +1,356 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import repeat
+from operator import itemgetter
+
+import heapq
+
+
+class NgramCounts:
+    """
+    Word, bigram and trigram counts for a single page.
+
+    Every distinct token is interned to an integer id once. Bigrams and
+    trigrams are then counted as single integers packed from those ids
+    (base `len(tokens)`), so no string is built per n-gram. Strings are only
+    materialized for the n-grams that are actually asked for.
+    """
+
+    __slots__ = ("tokens", "words", "bigrams", "trigrams")
+
+    def __init__(self, tokens=(), words=None, bigrams=None, trigrams=None):
+        self.tokens = list(tokens)
+        self.words = words if words is not None else Counter()
+        self.bigrams = bigrams if bigrams is not None else Counter()
+        self.trigrams = trigrams if trigrams is not None else Counter()
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        ids = {}
+        id_list = [ids.setdefault(token, len(ids)) for token in tokens]
+        size = len(ids)
+
+        following = id_list[1:]
+        bigrams = [a * size + b for a, b in zip(id_list, following)]
+        trigrams = [ab * size + c for ab, c in zip(bigrams, id_list[2:])]
+
+        return cls(
+            tokens=ids,
+            words=Counter(id_list),
+            bigrams=Counter(bigrams),
+            trigrams=Counter(trigrams),
+        )
+
+    def decode(self, key, n):
+        """
+        Returns the token ids packed into an n-gram key
+        """
+        size = len(self.tokens)
+        ids = []
+        for _ in range(n - 1):
+            key, token_id = divmod(key, size)
+            ids.append(token_id)
+        ids.append(key)
+        return ids[::-1]
+
+    def ngram(self, key, n):
+        """
+        Returns the text of an n-gram key
+        """
+        return " ".join(self.tokens[token_id] for token_id in self.decode(key, n))
+
+    def counts(self, n):
+        return (self.words, self.bigrams, self.trigrams)[n - 1]
+
+    def strings(self, n):
+        """
+        Returns a Counter of n-gram text to count
+        """
+        if n == 1:
+            return Counter({self.tokens[i]: cnt for i, cnt in self.words.items()})
+
+        return Counter({self.ngram(key, n): cnt for key, cnt in self.counts(n).items()})
+
+
+class Vocabulary:
+    """
+    Site-wide token interner. Each distinct token is stored once and mapped
+    to a small integer id that the site-wide counters are keyed by.
+    """
+
+    __slots__ = ("ids", "tokens")
+
+    def __init__(self):
+        self.ids = {}
+        self.tokens = []
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def intern(self, token):
+        token_id = self.ids.get(token)
+
+        if token_id is None:
+            token_id = self.ids[token] = len(self.tokens)
+            self.tokens.append(token)
+
+        return token_id
+
+    def intern_all(self, tokens):
+        return [self.intern(token) for token in tokens]
+
+    def lookup(self, text):
+        """
+        Returns the ids of the tokens in `text`, or None if any is unknown
+        """
+        ids = [self.ids.get(token) for token in text.split(" ")]
+        return None if None in ids else ids
+
+
+class WordCounts:
+    """
+    Site-wide word counts, stored densely in an array indexed by token id.
+    """
+
+    n = 1
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self.counts = array("Q")
+
+    def add(self, ids, cnt=1):
+        token_id = ids[0]
+        if token_id >= len(self.counts):
+            self.counts.extend(repeat(0, token_id + 1 - len(self.counts)))
+        self.counts[token_id] += cnt
+
+    def count_ids(self, ids):
+        token_id = ids[0]
+        return self.counts[token_id] if token_id < len(self.counts) else 0
+
+    def id_counts(self):
+        """
+        Yields (token ids, count) for every counted word
+        """
+        for token_id, cnt in enumerate(self.counts):
+            if cnt:
+                yield (token_id,), cnt
+
+    def __len__(self):
+        return sum(1 for cnt in self.counts if cnt)
+
+    def __getitem__(self, text):
+        ids = self.vocabulary.lookup(text)
+        return self.count_ids(ids) if ids and len(ids) == self.n else 0
+
+    def __iter__(self):
+        return (text for text, _ in self.items())
+
+    def __contains__(self, text):
+        return self[text] > 0
+
+    def get(self, text, default=None):
+        return self[text] or default
+
+    def text(self, ids):
+        return " ".join(self.vocabulary.tokens[token_id] for token_id in ids)
+
+    def items(self):
+        """
+        Yields (text, count) pairs, building each string on demand
+        """
+        for ids, cnt in self.id_counts():
+            yield self.text(ids), cnt
+
+    def most_common(self, n=None, min_count=1):
+        """
+        Returns the n most common (text, count) pairs with at least
+        `min_count` occurrences. Counts are pruned and ranked on the ids,
+        strings are only built for the entries that are returned.
+        """
+        candidates = (item for item in self.id_counts() if item[1] >= min_count)
+        return [(self.text(ids), cnt) for ids, cnt in top_items(candidates, n)]
+
+
+class PackedNgramCounts(WordCounts):
+    """
+    Site-wide bigram or trigram counts keyed by token ids.
+
+    The ids of an n-gram are packed into one 64 bit integer and the counts
+    live in runs of two parallel sorted arrays (keys and counts), 16 bytes
+    per distinct n-gram. New counts go to a small dict buffer that becomes
+    a new run once it grows past `buffer_size`. A run is merged into the one
+    before it while that one is less than twice its size, so there are only
+    O(log n) runs and each count is merged O(log n) times. The rare n-grams
+    whose ids do not fit in 64 bits are kept in a separate dict keyed by
+    tuple.
+    """
+
+    def __init__(self, vocabulary, n, buffer_size=100000):
+        self.vocabulary = vocabulary
+        self.n = n
+        self.bits = 64 // n
+        self.buffer_size = buffer_size
+        self.runs = []
+        self.buffer = {}
+        self.overflow = Counter()
+
+    def pack(self, ids):
+        if max(ids) >> self.bits:
+            return None
+
+        key = 0
+        for token_id in ids:
+            key = (key << self.bits) | token_id
+        return key
+
+    def unpack(self, key):
+        mask = (1 << self.bits) - 1
+        ids = []
+        for _ in range(self.n):
+            ids.append(key & mask)
+            key >>= self.bits
+        return tuple(ids[::-1])
+
+    def add(self, ids, cnt=1):
+        key = self.pack(ids)
+
+        if key is None:
+            self.overflow[tuple(ids)] += cnt
+            return
+
+        self.buffer[key] = self.buffer.get(key, 0) + cnt
+
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def merge(self, ngrams, site_ids):
+        """
+        Add the n-gram counts of a page's NgramCounts, where `site_ids` maps
+        the page's token ids to ids in this counter's vocabulary
+        """
+        if site_ids and max(site_ids) >> self.bits:
+            for key, cnt in ngrams.counts(self.n).items():
+                self.add([site_ids[i] for i in ngrams.decode(key, self.n)], cnt)
+            return
+
+        # fast path: re-pack the page key straight into a site key
+        size = len(ngrams.tokens)
+        bits, n = self.bits, self.n
+        buffer = self.buffer
+
+        for key, cnt in ngrams.counts(n).items():
+            site_key = 0
+            shift = 0
+            for _ in range(n):
+                key, token_id = divmod(key, size)
+                site_key |= site_ids[token_id] << shift
+                shift += bits
+            buffer[site_key] = buffer.get(site_key, 0) + cnt
+
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self, compact=False):
+        """
+        Turn the buffered counts into a sorted run, merging runs of similar
+        size. With `compact` all runs are merged into one.
+        """
+        runs = self.runs
+
+        if self.buffer:
+            items = sorted(self.buffer.items())
+            runs.append(
+                (
+                    array("Q", map(itemgetter(0), items)),
+                    array("Q", map(itemgetter(1), items)),
+                )
+            )
+            self.buffer = {}
+
+        while len(runs) > 1 and (
+            compact or len(runs[-2][0]) < 2 * len(runs[-1][0])
+        ):
+            run = runs.pop()
+            runs[-1] = merge_runs(runs[-1], run)
+
+    def count_ids(self, ids):
+        key = self.pack(ids)
+
+        if key is None:
+            return self.overflow[tuple(ids)]
+
+        total = self.buffer.get(key, 0)
+
+        for keys, counts in self.runs:
+            index = bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                total += counts[index]
+
+        return total
+
+    def id_counts(self):
+        self.flush(compact=True)
+
+        for keys, counts in self.runs:
+            for key, cnt in zip(keys, counts):
+                yield self.unpack(key), cnt
+
+        yield from self.overflow.items()
+
+    def __len__(self):
+        self.flush(compact=True)
+        return sum(len(keys) for keys, _ in self.runs) + len(self.overflow)
+
+
+def merge_runs(large, small):
+    """
+    Merges two sorted (keys, counts) runs, adding the counts of shared
+    keys. The smaller run is walked and the larger one copied in slices
+    between its keys.
+    """
+    if len(large[0]) < len(small[0]):
+        large, small = small, large
+
+    keys, counts = large
+    merged_keys, merged_counts = array("Q"), array("Q")
+    start = 0
+
+    for key, cnt in zip(*small):
+        end = bisect_left(keys, key, start)
+        merged_keys.extend(keys[start:end])
+        merged_counts.extend(counts[start:end])
+
+        if end < len(keys) and keys[end] == key:
+            cnt += counts[end]
+            end += 1
+
+        merged_keys.append(key)
+        merged_counts.append(cnt)
+        start = end
+
+    merged_keys.extend(keys[start:])
+    merged_counts.extend(counts[start:])
+
+    return merged_keys, merged_counts
+
+
+def top_items(items, n=None):
+    """
+    Returns the (key, count) items with the highest counts, most common
+    first. With `n` set only a heap of n items is kept instead of sorting
+    everything.
+    """
+    if n is None:
+        return sorted(items, key=itemgetter(1), reverse=True)
+    return heapq.nlargest(n, items, key=itemgetter(1))
+
+
+def most_common(counts, n=None, min_count=1):
+    """
+    most_common() for the site counters as well as plain dicts and Counters
+    """
+    if isinstance(counts, WordCounts):
+        return counts.most_common(n, min_count=min_count)
+    return top_items(((w, c) for w, c in counts.items() if c >= min_count), n)
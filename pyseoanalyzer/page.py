@@ -1,19 +1,22 @@
 import asyncio
 import hashlib
-import json
+import heapq
 import lxml.html as lh
 import os
 import re
 import trafilatura
 
-from bs4 import BeautifulSoup
 from collections import Counter
-from string import punctuation
-from urllib.parse import urlsplit
+from lxml import etree
+from trafilatura.xml import xmltotxt
+from urllib.parse import urljoin, urlsplit
 from urllib3.exceptions import HTTPError
 
-from .http import http
+from .http import async_http
+from .http import http as default_http
 from .llm_analyst import LLMSEOEnhancer
+from .ngrams import NgramCounts
+from .similarity import simhash
 from .stopwords import ENGLISH_STOP_WORDS
 
 TOKEN_REGEX = re.compile(r"(?u)\b\w\w+\b")
@@ -41,6 +44,39 @@ ADDITIONAL_TAGS_XPATHS = {
     "og_image": '//meta[@property="og:image"]/@content',
 }
 
+# lxml's HTML parser already lowercases tag and attribute names, attribute
+# values are lowercased inside the query where case must not matter.
+LOWER = "translate({0}, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+
+OG_TAGS_XPATHS = {
+    tag: etree.XPath(f'//meta[{LOWER.format("@property")}="{tag}"]')
+    for tag in ("og:title", "og:description", "og:image")
+}
+
+META_KEYWORDS_XPATH = etree.XPath(
+    f'//meta[{LOWER.format("@name")}="keywords"]/@content', smart_strings=False
+)
+
+# Compile once, the same expressions run against every page. Plain strings
+# are returned so results don't keep the whole document tree alive.
+COMPILED_HEADING_TAGS_XPATHS = {
+    tag: etree.XPath(xpath) for tag, xpath in HEADING_TAGS_XPATHS.items()
+}
+
+COMPILED_ADDITIONAL_TAGS_XPATHS = {
+    tag: etree.XPath(xpath, smart_strings=False)
+    for tag, xpath in ADDITIONAL_TAGS_XPATHS.items()
+}
+
+ANCHOR_XPATH = etree.XPath("//a[@href]")
+IMG_XPATH = etree.XPath("//img")
+H1_XPATH = etree.XPath("//h1")
+
+UTF8_PARSER = lh.HTMLParser(encoding="utf-8")
+
+# Responses of any other type are rejected before their body is downloaded
+PAGE_CONTENT_TYPES = ("text/html", "text/plain")
+
 IMAGE_EXTENSIONS = set(
     [
         ".img",
@@ -56,6 +92,13 @@ IMAGE_EXTENSIONS = set(
 )
 
 
+def hash_content(raw_html, encoding="utf-8"):
+    """
+    Returns the content hash a page's HTML is identified by
+    """
+    return hashlib.sha1(raw_html.encode(encoding)).hexdigest()
+
+
 class Page:
     """
     Container for each page and the core analyzer.
@@ -69,6 +112,9 @@ class Page:
         analyze_extra_tags=False,
         encoding="utf-8",
         run_llm_analysis=False,
+        top_k=None,
+        min_count=5,
+        http=None,
     ):
         """
         Variables go here, *not* outside of __init__
@@ -81,6 +127,9 @@ class Page:
         self.analyze_extra_tags = analyze_extra_tags
         self.encoding = encoding
         self.run_llm_analysis = run_llm_analysis
+        self.top_k = top_k
+        self.min_count = min_count
+        self.http = http or default_http
         self.title: str = ""
         self.author: str = ""
         self.description: str = ""
@@ -89,17 +138,16 @@ class Page:
         self.date: str
         self.keywords = {}
         self.warnings = []
-        self.translation = bytes.maketrans(
-            punctuation.encode(encoding), str(" " * len(punctuation)).encode(encoding)
-        )
         self.links = []
         self.total_word_count = 0
         self.wordcount = Counter()
-        self.bigrams = Counter()
-        self.trigrams = Counter()
+        self.ngrams = NgramCounts()
+        self._bigrams = None
+        self._trigrams = None
         self.stem_to_word = {}
         self.content: str = None
         self.content_hash: str = None
+        self.simhash = None
 
         if run_llm_analysis:
             self.llm_analysis = {}
@@ -110,6 +158,18 @@ class Page:
         if analyze_extra_tags:
             self.additional_info = {}
 
+    @property
+    def bigrams(self):
+        if self._bigrams is None:
+            self._bigrams = self.ngrams.strings(2)
+        return self._bigrams
+
+    @property
+    def trigrams(self):
+        if self._trigrams is None:
+            self._trigrams = self.ngrams.strings(3)
+        return self._trigrams
+
     def as_dict(self):
         """
         Returns a dictionary that can be printed
@@ -124,7 +184,9 @@ class Page:
             "sitename": self.sitename,
             "date": self.date,
             "word_count": self.total_word_count,
-            "keywords": self.sort_freq_dist(self.keywords, limit=5),
+            "keywords": self.sort_freq_dist(
+                self.keywords, limit=self.min_count, top_k=self.top_k
+            ),
             "bigrams": self.bigrams,
             "trigrams": self.trigrams,
             "warnings": self.warnings,
@@ -142,31 +204,23 @@ class Page:
 
         return context
 
-    def analyze_heading_tags(self, bs):
+    def analyze_heading_tags(self, dom):
         """
         Analyze the heading tags and populate the headings
         """
 
-        try:
-            dom = lh.fromstring(str(bs))
-        except ValueError as _:
-            dom = lh.fromstring(bs.encode(self.encoding))
-        for tag, xpath in HEADING_TAGS_XPATHS.items():
-            value = [heading.text_content() for heading in dom.xpath(xpath)]
+        for tag, xpath in COMPILED_HEADING_TAGS_XPATHS.items():
+            value = [heading.text_content() for heading in xpath(dom)]
             if value:
                 self.headings.update({tag: value})
 
-    def analyze_additional_tags(self, bs):
+    def analyze_additional_tags(self, dom):
         """
         Analyze additional tags and populate the additional info
         """
 
-        try:
-            dom = lh.fromstring(str(bs))
-        except ValueError as _:
-            dom = lh.fromstring(bs.encode(self.encoding))
-        for tag, xpath in ADDITIONAL_TAGS_XPATHS.items():
-            value = dom.xpath(xpath)
+        for tag, xpath in COMPILED_ADDITIONAL_TAGS_XPATHS.items():
+            value = xpath(dom)
             if value:
                 self.additional_info.update({tag: value})
 
@@ -176,60 +230,172 @@ class Page:
         """
 
         if not raw_html:
-            valid_prefixes = []
-
-            # only allow http:// https:// and //
-            for s in [
-                "http://",
-                "https://",
-                "//",
-            ]:
-                valid_prefixes.append(self.url.startswith(s))
-
-            if True not in valid_prefixes:
-                self.warn(f"{self.url} does not appear to have a valid protocol.")
+            raw_html = self.fetch()
+
+            if raw_html is None:
                 return
 
-            if self.url.startswith("//"):
-                self.url = f"{self.base_domain.scheme}:{self.url}"
+        if not self.analyze_html(raw_html):
+            return
 
-            if self.parsed_url.netloc != self.base_domain.netloc:
-                self.warn(f"{self.url} is not part of {self.base_domain.netloc}.")
-                return
+        if self.run_llm_analysis:
+            self.llm_analysis = self.use_llm_analyzer()
 
-            try:
-                page = http.get(self.url)
-            except HTTPError as e:
-                self.warn(f"Returned {e}")
+        return True
+
+    async def analyze_async(self, raw_html=None, client=None):
+        """
+        Awaitable version of analyze(). The fetch and the LLM chains are
+        awaited on the running loop, while the CPU-bound parsing runs in the
+        loop's default executor so it does not stall other pages.
+        """
+
+        if not raw_html:
+            raw_html = await self.fetch_async(client)
+
+            if raw_html is None:
                 return
 
-            encoding = self.encoding
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self.analyze_html, raw_html):
+            return
 
-            if "content-type" in page.headers:
-                content_type = page.headers["content-type"]
-                if not any(t in content_type for t in ("text/html", "text/plain")):
-                    self.warn(f"Can not read {content_type}")
-                    return
-                if "charset=" in content_type:
-                    encoding = content_type.split("charset=")[-1].strip()
+        if self.run_llm_analysis:
+            self.llm_analysis = await self.use_llm_analyzer_async()
 
-            raw_html = page.data.decode(encoding, errors="replace")
+        return True
+
+    def fetch(self):
+        """
+        Download the page and return its decoded HTML, or None if it can not
+        be analyzed
+        """
+
+        if not self.check_url():
+            return None
+
+        try:
+            page = self.http.get(self.url, content_types=PAGE_CONTENT_TYPES)
+        except HTTPError as e:
+            self.warn(f"Returned {e}")
+            return None
+
+        return self.decode_response(page)
+
+    async def fetch_async(self, client=None):
+        """
+        Awaitable version of fetch()
+        """
 
-        self.content_hash = hashlib.sha1(raw_html.encode(self.encoding)).hexdigest()
+        if not self.check_url():
+            return None
 
-        # Use trafilatura to extract metadata
-        metadata = trafilatura.extract_metadata(
-            filecontent=raw_html,
-            default_url=self.url,
-            extensive=True,
+        try:
+            page = await (client or async_http).get(
+                self.url, content_types=PAGE_CONTENT_TYPES
+            )
+        except HTTPError as e:
+            self.warn(f"Returned {e}")
+            return None
+
+        return self.decode_response(page)
+
+    def check_url(self):
+        """
+        Make sure the url can be fetched and belongs to the site being crawled
+        """
+
+        valid_prefixes = []
+
+        # only allow http:// https:// and //
+        for s in [
+            "http://",
+            "https://",
+            "//",
+        ]:
+            valid_prefixes.append(self.url.startswith(s))
+
+        if True not in valid_prefixes:
+            self.warn(f"{self.url} does not appear to have a valid protocol.")
+            return False
+
+        if self.url.startswith("//"):
+            self.url = f"{self.base_domain.scheme}:{self.url}"
+
+        if self.parsed_url.netloc != self.base_domain.netloc:
+            self.warn(f"{self.url} is not part of {self.base_domain.netloc}.")
+            return False
+
+        return True
+
+    def decode_response(self, page):
+        """
+        Returns the decoded body of an HTML or plain text response, or None
+        """
+
+        encoding = self.encoding
+
+        if "content-type" in page.headers:
+            content_type = page.headers["content-type"]
+            if not any(t in content_type for t in PAGE_CONTENT_TYPES):
+                self.warn(f"Can not read {content_type}")
+                return None
+            if "charset=" in content_type:
+                encoding = content_type.split("charset=")[-1].strip()
+
+        data = page.data or b""
+
+        if getattr(page, "truncated", False):
+            self.warn(
+                f"Page is larger than {len(data)} bytes, the rest was not analyzed"
+            )
+
+        # hash the bytes as they were served, not a re-encoded copy
+        self.content_hash = hashlib.sha1(data).hexdigest()
+
+        return data.decode(encoding, errors="replace")
+
+    def analyze_html(self, raw_html):
+        """
+        Run every check against the raw HTML of the page. The document is
+        parsed once and the same tree is shared by trafilatura and all of
+        the checks. Returns False if the HTML can not be parsed at all.
+        """
+
+        if self.content_hash is None:
+            self.content_hash = hash_content(raw_html, self.encoding)
+
+        dom = self.parse_html(raw_html)
+
+        if dom is None:
+            self.warn(f"Could not parse the HTML of {self.url}")
+            return False
+
+        # trafilatura works on its own copy of the tree, so it is safe to
+        # share ours and extract the metadata and the content in one pass
+        document = trafilatura.bare_extraction(
+            dom,
+            url=self.url,
+            with_metadata=True,
+            include_links=True,
+            include_formatting=False,
+            include_tables=True,
+            include_images=True,
         )
 
-        # I want to grab values from this even if they don't exist
-        metadata_dict = metadata.as_dict() if metadata else {}
+        if document is None:
+            # no usable content, but the metadata is still worth reporting
+            document = trafilatura.extract_metadata(
+                dom, default_url=self.url, extensive=True
+            )
+            text, comments = "", ""
+        else:
+            text = xmltotxt(document.body, include_formatting=False)
+            comments = xmltotxt(document.commentsbody, include_formatting=False)
 
         # Helper function to get value or default to "" if None or 'None'
         def get_meta_value(key):
-            value = metadata_dict.get(key)
+            value = getattr(document, key, None)
             return "" if value is None or value == "None" else value
 
         # Ensure fields are strings, defaulting to "" if None or 'None'
@@ -239,74 +405,93 @@ class Page:
         self.hostname = get_meta_value("hostname")
         self.sitename = get_meta_value("sitename")
         self.date = get_meta_value("date")
-        metadata_keywords = get_meta_value("keywords")
 
-        if len(metadata_keywords) > 0:
+        # the page's metadata and text, as the LLM analysis gets to see it
+        self.content = {
+            "url": self.url,
+            "title": self.title,
+            "author": self.author,
+            "description": self.description,
+            "hostname": self.hostname,
+            "sitename": self.sitename,
+            "date": self.date,
+            "language": get_meta_value("language"),
+            "categories": getattr(document, "categories", None) or [],
+            "tags": getattr(document, "tags", None) or [],
+            "text": text,
+            "comments": comments,
+        }
+
+        if any(keywords.strip() for keywords in META_KEYWORDS_XPATH(dom)):
             self.warn(
                 f"Keywords should be avoided as they are a spam indicator and no longer used by Search Engines"
             )
 
-        # use trafulatura to extract the content
-        content = trafilatura.extract(
-            raw_html,
-            include_links=True,
-            include_formatting=False,
-            include_tables=True,
-            include_images=True,
-            output_format="json",
-        )
-
-        self.content = json.loads(content) if content else None
-
-        # remove comments, they screw with BeautifulSoup
-        html_without_comments = re.sub(r"<!--.*?-->", r"", raw_html, flags=re.DOTALL)
-
-        # use BeautifulSoup to parse the more nuanced tags
-        soup_lower = BeautifulSoup(html_without_comments.lower(), "html.parser")
-        soup_unmodified = BeautifulSoup(html_without_comments, "html.parser")
-
         self.process_text(self.content["text"])
+        self.simhash = self.text_simhash()
 
         self.analyze_title()
         self.analyze_description()
-        self.analyze_og(soup_lower)
-        self.analyze_a_tags(soup_unmodified)
-        self.analyze_img_tags(soup_lower)
-        self.analyze_h1_tags(soup_lower)
-        self.analyze_html_lang(soup_lower)
+        self.analyze_og(dom)
+        self.analyze_a_tags(dom)
+        self.analyze_img_tags(dom)
+        self.analyze_h1_tags(dom)
+        self.analyze_html_lang(dom)
 
         if self.analyze_headings:
-            self.analyze_heading_tags(soup_unmodified)
+            self.analyze_heading_tags(dom)
 
         if self.analyze_extra_tags:
-            self.analyze_additional_tags(soup_unmodified)
-
-        if self.run_llm_analysis:
-            self.llm_analysis = self.use_llm_analyzer()
+            self.analyze_additional_tags(dom)
 
         return True
 
+    def parse_html(self, raw_html):
+        """
+        Parse the raw HTML into an lxml tree, or None if it is not HTML
+        """
+
+        try:
+            try:
+                return lh.document_fromstring(raw_html)
+            except ValueError:
+                # Unicode strings with an encoding declaration are refused
+                return lh.document_fromstring(
+                    raw_html.encode("utf-8"), parser=UTF8_PARSER
+                )
+        except etree.ParserError:
+            return None
+
     def use_llm_analyzer(self):
         """
         Use the LLM analyzer to enhance the SEO analysis
         """
 
+        return asyncio.run(self.use_llm_analyzer_async())
+
+    async def use_llm_analyzer_async(self):
+        """
+        Awaitable version of use_llm_analyzer() for callers already running
+        inside an event loop
+        """
+
         llm_enhancer = LLMSEOEnhancer()
-        return asyncio.run(llm_enhancer.enhance_seo_analysis(self.content))
+        return await llm_enhancer.enhance_seo_analysis(self.content)
 
     def word_list_freq_dist(self, wordlist):
-        freq = [wordlist.count(w) for w in wordlist]
-        return dict(zip(wordlist, freq))
+        return dict(Counter(wordlist))
 
-    def sort_freq_dist(self, freqdist, limit=1):
-        aux = [
+    def sort_freq_dist(self, freqdist, limit=1, top_k=None):
+        aux = (
             (freqdist[key], self.stem_to_word[key])
             for key in freqdist
             if freqdist[key] >= limit
-        ]
-        aux.sort()
-        aux.reverse()
-        return aux
+        )
+
+        if top_k is None:
+            return sorted(aux, reverse=True)
+
+        return heapq.nlargest(top_k, aux)
 
     def raw_tokenize(self, rawtext):
         return TOKEN_REGEX.findall(rawtext.lower())
@@ -322,26 +507,19 @@ class Page:
         return zip(*[D[i:] for i in range(n)])
 
     def process_text(self, page_text):
-        tokens = self.tokenize(page_text)
         raw_tokens = self.raw_tokenize(page_text)
         self.total_word_count = len(raw_tokens)
 
-        bigrams = self.getngrams(raw_tokens, 2)
-
-        for ng in bigrams:
-            vt = " ".join(ng)
-            self.bigrams[vt] += 1
+        # tokens are interned once and every count below works on their ids
+        self.ngrams = NgramCounts.from_tokens(raw_tokens)
+        self._bigrams = None
+        self._trigrams = None
 
-        trigrams = self.getngrams(raw_tokens, 3)
+        for token_id, cnt in self.ngrams.words.items():
+            word = self.ngrams.tokens[token_id]
 
-        for ng in trigrams:
-            vt = " ".join(ng)
-            self.trigrams[vt] += 1
-
-        freq_dist = self.word_list_freq_dist(tokens)
-
-        for word in freq_dist:
-            cnt = freq_dist[word]
+            if word in ENGLISH_STOP_WORDS:
+                continue
 
             if word not in self.stem_to_word:
                 self.stem_to_word[word] = word
@@ -356,13 +534,24 @@ class Page:
             else:
                 self.keywords[word] = cnt
 
-    def analyze_og(self, bs):
+    def text_simhash(self):
+        """
+        SimHash of the extracted text, built from its word trigrams (or its
+        words on very short pages) weighted by how often they occur
+        """
+        n = 3 if self.ngrams.trigrams else 1
+        return simhash(
+            (self.ngrams.ngram(key, n) if n > 1 else self.ngrams.tokens[key], cnt)
+            for key, cnt in self.ngrams.counts(n).items()
+        )
+
+    def analyze_og(self, dom):
         """
         Validate open graph tags
         """
-        og_title = bs.findAll("meta", attrs={"property": "og:title"})
-        og_description = bs.findAll("meta", attrs={"property": "og:description"})
-        og_image = bs.findAll("meta", attrs={"property": "og:image"})
+        og_title = OG_TAGS_XPATHS["og:title"](dom)
+        og_description = OG_TAGS_XPATHS["og:description"](dom)
+        og_image = OG_TAGS_XPATHS["og:image"](dom)
 
         if len(og_title) == 0:
             self.warn("Missing og:title")
@@ -417,56 +606,47 @@ class Page:
                 "Description is too long (more than 255 characters): {0}".format(d)
             )
 
-    def visible_tags(self, element):
-        if element.parent.name in ["style", "script", "[document]"]:
-            return False
-
-        return True
-
-    def analyze_img_tags(self, bs):
+    def analyze_img_tags(self, dom):
         """
         Verifies that each img has an alt and title
         """
-        images = bs.find_all("img")
+        images = IMG_XPATH(dom)
 
         for image in images:
-            src = ""
-            if "src" in image:
-                src = image["src"]
-            elif "data-src" in image:
-                src = image["data-src"]
-            else:
-                src = image
+            src = image.get("src") or image.get("data-src")
+
+            if not src:
+                src = lh.tostring(image, encoding="unicode", with_tail=False)
 
             if len(image.get("alt", "")) == 0:
                 self.warn("Image missing alt tag: {0}".format(src))
 
-    def analyze_h1_tags(self, bs):
+    def analyze_h1_tags(self, dom):
         """
         Make sure each page has at least one H1 tag
         """
-        htags = bs.find_all("h1")
+        htags = H1_XPATH(dom)
 
         if len(htags) == 0:
             self.warn("Each page should have at least one h1 tag")
 
-    def analyze_html_lang(self, bs):
+    def analyze_html_lang(self, dom):
         """
         Make sure the HTML tag has a lang attribute
         """
-        html_tag = bs.find("html")
-        if html_tag is not None and not html_tag.get("lang"):
+        html_tag = dom.getroottree().getroot()
+        if html_tag.tag == "html" and not html_tag.get("lang"):
             self.warn("Missing lang attribute on <html> tag")
 
-    def analyze_a_tags(self, bs):
+    def analyze_a_tags(self, dom):
         """
         Add any new links (that we didn't find in the sitemap)
         """
-        anchors = bs.find_all("a", href=True)
+        anchors = ANCHOR_XPATH(dom)
 
         for tag in anchors:
-            tag_href = tag["href"]
-            tag_text = tag.text.lower().strip()
+            tag_href = tag.get("href")
+            tag_text = tag.text_content().lower().strip()
 
             if len(tag.get("title", "")) == 0:
                 self.warn("Anchor missing title tag: {0}".format(tag_href))
@@ -485,32 +665,163 @@ class Page:
             if url_file_extension in IMAGE_EXTENSIONS:
                 continue
 
-            # remove hash links to all urls
-            if "#" in modified_url:
-                modified_url = modified_url[: modified_url.rindex("#")]
-
+            # fragments and other variations are normalized away when the
+            # link is queued
             self.links.append(modified_url)
 
     def rel_to_abs_url(self, link):
-        if ":" in link:
-            return link
+        """
+        Resolve a link against the url of the page it was found on
+        """
+        return urljoin(self.url, link)
+
+    def warn(self, warning):
+        self.warnings.append(warning)
+
 
-        relative_path = link
-        domain = self.base_domain.netloc
+class PageResult:
+    """
+    Compact, picklable record of an analyzed page.
 
-        if domain[-1] == "/":
-            domain = domain[:-1]
+    Holds only what as_dict() and the site-wide aggregates need, so it can
+    be returned from a parse worker process instead of the full Page, and
+    kept for the whole crawl without the parsed content, links-to-be and
+    per-word bookkeeping of the Page it came from.
+    """
 
-        if len(relative_path) > 0 and relative_path[0] == "?":
-            if "?" in self.url:
-                return f'{self.url[:self.url.index("?")]}{relative_path}'
+    __slots__ = (
+        "url",
+        "title",
+        "description",
+        "author",
+        "hostname",
+        "sitename",
+        "date",
+        "total_word_count",
+        "keywords",
+        "wordcount",
+        "ngrams",
+        "warnings",
+        "content_hash",
+        "simhash",
+        "links",
+        "headings",
+        "additional_info",
+        "llm_analysis",
+    )
+
+    @classmethod
+    def from_page(cls, page):
+        result = cls()
+        result.url = page.url
+        result.title = page.title
+        result.description = page.description
+        result.author = page.author
+        result.hostname = page.hostname
+        result.sitename = page.sitename
+        result.date = page.date
+        result.total_word_count = page.total_word_count
+        result.keywords = page.sort_freq_dist(
+            page.keywords, limit=page.min_count, top_k=page.top_k
+        )
+        result.wordcount = page.wordcount
+        result.ngrams = page.ngrams
+        result.warnings = page.warnings
+        result.content_hash = page.content_hash
+        result.simhash = page.simhash
+        result.links = page.links
+        result.headings = page.headings if page.analyze_headings else None
+        result.additional_info = (
+            page.additional_info if page.analyze_extra_tags else None
+        )
+        result.llm_analysis = page.llm_analysis if page.run_llm_analysis else None
+        return result
 
-            return f"{self.url}{relative_path}"
+    @property
+    def bigrams(self):
+        return self.ngrams.strings(2) if self.ngrams is not None else {}
 
-        if len(relative_path) > 0 and relative_path[0] != "/":
-            relative_path = f"/{relative_path}"
+    @property
+    def trigrams(self):
+        return self.ngrams.strings(3) if self.ngrams is not None else {}
 
-        return f"{self.base_domain.scheme}://{domain}{relative_path}"
+    def release(self):
+        """
+        Drop the counts and links once they have been merged into the site
+        totals. The page's own bigrams and trigrams are reported empty after
+        this.
+        """
+        self.wordcount = None
+        self.ngrams = None
+        self.links = None
 
-    def warn(self, warning):
-        self.warnings.append(warning)
+    def as_dict(self):
+        """
+        Returns a dictionary that can be printed
+        """
+
+        context = {
+            "url": self.url,
+            "title": self.title,
+            "description": self.description,
+            "author": self.author,
+            "hostname": self.hostname,
+            "sitename": self.sitename,
+            "date": self.date,
+            "word_count": self.total_word_count,
+            "keywords": self.keywords,
+            "bigrams": self.bigrams,
+            "trigrams": self.trigrams,
+            "warnings": self.warnings,
+            "content_hash": self.content_hash,
+        }
+
+        if self.headings is not None:
+            context["headings"] = self.headings
+
+        if self.additional_info is not None:
+            context["additional_info"] = self.additional_info
+
+        if self.llm_analysis is not None:
+            context["llm_analysis"] = self.llm_analysis
+
+        return context
+
+
+def parse_page(
+    url,
+    base_domain,
+    raw_html,
+    analyze_headings=False,
+    analyze_extra_tags=False,
+    run_llm_analysis=False,
+    top_k=None,
+    min_count=5,
+    content_hash=None,
+    keep_content=False,
+):
+    """
+    Analyze already fetched HTML and return a PageResult, or None if the
+    analysis did not complete. Meant to run inside a parse worker process.
+    `content_hash` is the hash of the response body, if it is known. With
+    `keep_content`, (PageResult, extracted content) is returned instead.
+    """
+
+    page = Page(
+        url=url,
+        base_domain=base_domain,
+        analyze_headings=analyze_headings,
+        analyze_extra_tags=analyze_extra_tags,
+        run_llm_analysis=run_llm_analysis,
+        top_k=top_k,
+        min_count=min_count,
+    )
+    page.content_hash = content_hash
+
+    if not page.analyze(raw_html=raw_html):
+        return None
+
+    if keep_content:
+        return PageResult.from_page(page), page.content
+
+    return PageResult.from_page(page)
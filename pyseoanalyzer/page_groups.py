@@ -0,0 +1,80 @@
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import re
+
+
+# pages beyond this many distinct templates share one catch-all group
+MAX_PAGE_GROUPS = 20
+OTHER_GROUP = "*"
+
+NUMBER_SEGMENT = re.compile(r"^\d+$")
+# hex ids, uuids and other segments that are mostly digits
+ID_SEGMENT = re.compile(r"^(?=.*\d)[0-9a-f-]{8,}$|^(?:[a-z]*\d){4,}[a-z\d]*$", re.I)
+
+
+def url_template(url):
+    """
+    The template a url was most likely generated from, e.g.
+    /blog/2024/my-post becomes /blog/{n}/{slug}. The first path segment is
+    kept as the section of the site when there are deeper ones, every
+    other segment is replaced by its kind.
+    """
+    segments = [segment for segment in urlsplit(url).path.split("/") if segment]
+
+    if not segments:
+        return "/"
+
+    template = []
+
+    for index, segment in enumerate(segments):
+        if NUMBER_SEGMENT.match(segment):
+            template.append("{n}")
+        elif ID_SEGMENT.match(segment):
+            template.append("{id}")
+        elif index == 0 and len(segments) > 1:
+            template.append(segment.lower())
+        else:
+            template.append("{slug}")
+
+    return "/" + "/".join(template)
+
+
+class PageGroups:
+    """
+    Crawled pages grouped by url template, for the site-level LLM analysis.
+
+    Every page of a group is kept so the group's findings can be attached
+    to it, but only the content of the first `samples` pages of each group
+    is kept for the model. Once `max_groups` templates have been seen, new
+    ones go to a single catch-all group.
+    """
+
+    def __init__(self, samples=2, max_groups=MAX_PAGE_GROUPS):
+        self.samples = samples
+        self.max_groups = max_groups
+        self.pages = defaultdict(list)
+        self.sampled = defaultdict(list)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def add(self, page, content):
+        template = url_template(page.url)
+
+        if template not in self.pages and len(self.pages) >= self.max_groups:
+            template = OTHER_GROUP
+
+        self.pages[template].append(page)
+
+        if content and len(self.sampled[template]) < self.samples:
+            self.sampled[template].append(
+                {
+                    "url": page.url,
+                    "title": page.title,
+                    "description": page.description,
+                    **content,
+                }
+            )
+
+        return template
@@ -0,0 +1,244 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from threading import Condition
+from urllib.parse import urlsplit
+
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean the host wants us to slow down
+BACKOFF_STATUSES = (429, 503)
+
+# a robots.txt Crawl-delay above this many seconds would stall the crawl
+MAX_CRAWL_DELAY = 60.0
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, in bursts of up to
+    `burst` requests. A rate of None never limits.
+
+    Tokens may go negative: every caller reserves a token straight away and
+    is told how long to wait before using it, so concurrent callers are
+    spaced out instead of all retrying at once.
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = None
+
+    def reserve(self, now):
+        """
+        Take a token, returns the number of seconds to wait before using it
+        """
+        if not self.rate:
+            return 0
+
+        if self.updated is not None:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+        self.updated = now
+        self.tokens -= 1
+
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class HostState:
+    __slots__ = ("bucket", "active", "not_before", "failures")
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.active = 0
+        self.not_before = 0
+        self.failures = 0
+
+
+class PolitenessScheduler:
+    """
+    Per-host rate limits for a crawl.
+
+    Every host gets its own token bucket (`rate` requests per second, or the
+    host's robots.txt Crawl-delay if that is slower, capped at
+    `max_crawl_delay` seconds) and at most `max_per_host` requests in
+    flight. A 429 or 503 response pauses the host for its Retry-After, or
+    for an exponentially growing backoff if it sent none, capped at
+    `max_backoff` seconds.
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        burst=1,
+        max_per_host=None,
+        backoff=1.0,
+        max_backoff=60.0,
+        max_crawl_delay=MAX_CRAWL_DELAY,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_per_host = max_per_host
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_crawl_delay = max_crawl_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.condition = Condition()
+        self.hosts = defaultdict(lambda: HostState(TokenBucket(rate, burst)))
+
+    def set_crawl_delay(self, host, delay):
+        """
+        Never request more than one page every `delay` seconds from `host`,
+        or every `max_crawl_delay` seconds if `delay` is longer
+        """
+        if not delay or delay <= 0:
+            return
+
+        if self.max_crawl_delay and delay > self.max_crawl_delay:
+            logger.warning(
+                "Crawl-delay of %gs for %s capped at %gs",
+                delay,
+                host,
+                self.max_crawl_delay,
+            )
+            delay = self.max_crawl_delay
+
+        rate = 1 / delay
+        if self.rate:
+            rate = min(rate, self.rate)
+
+        with self.condition:
+            self.hosts[host].bucket = TokenBucket(rate, burst=1)
+
+    def acquire(self, url):
+        """
+        Block until a request to the host of `url` is allowed
+        """
+        host = urlsplit(url).netloc
+
+        with self.condition:
+            state = self.hosts[host]
+
+            while self.max_per_host and state.active >= self.max_per_host:
+                self.condition.wait()
+
+            state.active += 1
+            now = self.clock()
+            delay = max(state.bucket.reserve(now), state.not_before - now)
+
+        if delay > 0:
+            self.sleep(delay)
+
+    def release(self, url, status=None, retry_after=None):
+        """
+        Mark a request as done. `status` and `retry_after` come from the
+        response, if there was one.
+        """
+        host = urlsplit(url).netloc
+
+        with self.condition:
+            state = self.hosts[host]
+            state.active -= 1
+
+            if status in BACKOFF_STATUSES:
+                state.failures += 1
+
+                if retry_after is None:
+                    retry_after = self.backoff * 2 ** (state.failures - 1)
+
+                state.not_before = max(
+                    state.not_before,
+                    self.clock() + min(retry_after, self.max_backoff),
+                )
+            elif status is not None:
+                state.failures = 0
+
+            self.condition.notify_all()
+
+
+def parse_retry_after(value, now=None):
+    """
+    Returns the number of seconds a Retry-After header asks to wait, or None
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+
+    if value.isdigit():
+        return float(value)
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    now = time.time() if now is None else now
+    return max(0.0, date.timestamp() - now)
+
+
+class PoliteHttp:
+    """
+    Wraps an `Http` client so every request goes through a
+    PolitenessScheduler. Requests answered with 429 or 503 are retried up to
+    `retries` times once the host's backoff has passed.
+    """
+
+    def __init__(self, client, scheduler, retries=2):
+        self.client = client
+        self.scheduler = scheduler
+        self.retries = retries
+
+    def get(self, url, **kwargs):
+        for attempt in range(self.retries + 1):
+            self.scheduler.acquire(url)
+
+            try:
+                response = self.client.get(url, **kwargs)
+            except BaseException:
+                self.scheduler.release(url)
+                raise
+
+            self.scheduler.release(
+                url,
+                response.status,
+                parse_retry_after(response.headers.get("Retry-After")),
+            )
+
+            if response.status not in BACKOFF_STATUSES:
+                break
+
+        return response
+
+    @contextmanager
+    def stream(self, url, **kwargs):
+        """
+        Streaming version of get(), see Http.stream(). The host's slot is
+        held until the body has been read.
+        """
+        for attempt in range(self.retries + 1):
+            self.scheduler.acquire(url)
+            status = retry_after = None
+
+            try:
+                with self.client.stream(url, **kwargs) as (response, body):
+                    status = response.status
+                    retry_after = parse_retry_after(
+                        response.headers.get("Retry-After")
+                    )
+
+                    if status in BACKOFF_STATUSES and attempt < self.retries:
+                        continue
+
+                    yield response, body
+                    return
+            finally:
+                self.scheduler.release(url, status, retry_after)
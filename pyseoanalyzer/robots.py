@@ -0,0 +1,219 @@
+from threading import Lock
+from urllib.parse import urlsplit
+
+import re
+
+from .http import DEFAULT_USER_AGENT
+
+
+# The user-agent token robots.txt groups are matched against when crawling
+# with the default User-Agent. Sites without a group for it fall back to
+# the "*" group.
+ROBOTS_USER_AGENT = "pyseoanalyzer"
+
+PRODUCT_TOKEN = re.compile(r"[A-Za-z_-]+")
+
+
+def robots_agent(user_agent):
+    """
+    Returns the product token robots.txt groups are matched against for a
+    User-Agent, e.g. "MyBot" for "MyBot/1.2 (+https://example.com/bot)".
+    The default browser-like User-Agent is matched as ROBOTS_USER_AGENT.
+    """
+    if not user_agent or user_agent == DEFAULT_USER_AGENT:
+        return ROBOTS_USER_AGENT
+
+    token = PRODUCT_TOKEN.match(user_agent.strip())
+    return token.group(0) if token else ROBOTS_USER_AGENT
+
+
+class RuleGroup:
+    __slots__ = ("agents", "rules", "crawl_delay")
+
+    def __init__(self):
+        self.agents = []
+        self.rules = []
+        self.crawl_delay = None
+
+
+class RobotsMatcher:
+    """
+    The Allow and Disallow rules of a group compiled into one regex.
+
+    Rules are ordered the way conflicts are resolved (the longest pattern
+    wins, Allow wins a tie) and joined into a single alternation anchored
+    at the start of the path. The first alternative that matches is
+    therefore the deciding rule, and one regex match answers the question
+    for any url.
+    """
+
+    def __init__(self, rules):
+        rules = sorted(rules, key=lambda rule: (-len(rule[1]), not rule[0]))
+        self.allows = [allow for allow, _ in rules]
+        self.regex = (
+            re.compile("|".join(f"({pattern_to_regex(p)})" for _, p in rules))
+            if rules
+            else None
+        )
+
+    def allowed(self, path):
+        if self.regex is None:
+            return True
+
+        match = self.regex.match(path)
+        return match is None or self.allows[match.lastindex - 1]
+
+
+def pattern_to_regex(pattern):
+    """
+    Translate a robots.txt path pattern, with `*` matching any run of
+    characters and a trailing `$` anchoring the end of the url
+    """
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    return regex + r"\Z" if anchored else regex
+
+
+class RobotsRules:
+    """
+    Parsed robots.txt. Groups for the same user-agent are merged, and each
+    user-agent's rules are compiled into a RobotsMatcher the first time they
+    are needed.
+    """
+
+    def __init__(self, text=""):
+        self.groups = parse_robots_txt(text)
+        self.matchers = {}
+
+    def group_for(self, agent, fallback=True):
+        """
+        Returns the merged group of rules that applies to `agent`: its own
+        group if it has one, else the "*" group when `fallback` is set.
+        Returns None if no group applies.
+        """
+        agent = agent.lower()
+        group = self.groups.get(agent)
+
+        if group is None and fallback:
+            group = self.groups.get("*")
+
+        return group
+
+    def matcher(self, agent, fallback=True):
+        key = (agent.lower(), fallback)
+
+        if key not in self.matchers:
+            group = self.group_for(agent, fallback)
+            self.matchers[key] = RobotsMatcher(group.rules if group else [])
+
+        return self.matchers[key]
+
+    def can_fetch(self, url, agent=ROBOTS_USER_AGENT, fallback=True):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        return self.matcher(agent, fallback).allowed(path)
+
+    def has_group(self, agent):
+        return agent.lower() in self.groups
+
+    def crawl_delay(self, agent=ROBOTS_USER_AGENT):
+        group = self.group_for(agent)
+        return group.crawl_delay if group else None
+
+
+def parse_robots_txt(text):
+    """
+    Returns {user-agent: RuleGroup}, with the user-agents lower cased.
+    Consecutive User-agent lines share the group of rules that follows.
+    """
+    groups = {}
+    agents = []
+    in_rules = False
+
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line or ":" not in line:
+            continue
+
+        field, _, value = line.partition(":")
+        field = field.strip().lower()
+        value = value.strip()
+
+        if field == "user-agent":
+            # a user-agent after rules starts a new group
+            if in_rules:
+                agents = []
+                in_rules = False
+            agent = value.lower()
+            agents.append(groups.setdefault(agent, RuleGroup()))
+            groups[agent].agents.append(value)
+        elif field in ("allow", "disallow"):
+            in_rules = True
+            # an empty Disallow allows everything, it adds no rule
+            if value:
+                for group in agents:
+                    group.rules.append((field == "allow", value))
+        elif field == "crawl-delay":
+            in_rules = True
+            try:
+                delay = float(value)
+            except ValueError:
+                continue
+            for group in agents:
+                group.crawl_delay = delay
+
+    return groups
+
+
+class RobotsCache:
+    """
+    Fetches and parses each host's robots.txt once. A host without a
+    readable robots.txt is cached as None, which allows everything.
+    `on_load(origin, rules)` is called whenever a host's rules are loaded.
+    `agent` is the user-agent token the crawl is checked against, see
+    robots_agent().
+    """
+
+    def __init__(self, client, on_load=None, agent=ROBOTS_USER_AGENT):
+        self.client = client
+        self.on_load = on_load
+        self.agent = agent
+        self.rules = {}
+        self.lock = Lock()
+
+    def origin(self, url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def get(self, url):
+        origin = self.origin(url)
+
+        with self.lock:
+            if origin not in self.rules:
+                self.rules[origin] = self.fetch(origin)
+
+                if self.on_load is not None:
+                    self.on_load(origin, self.rules[origin])
+
+            return self.rules[origin]
+
+    def fetch(self, origin):
+        try:
+            response = self.client.get(f"{origin}/robots.txt")
+        except Exception:
+            return None
+
+        if response.status != 200:
+            return None
+
+        return RobotsRules((response.data or b"").decode("utf-8", errors="ignore"))
+
+    def allowed(self, url, agent=None):
+        rules = self.get(url)
+        return rules is None or rules.can_fetch(url, agent or self.agent)
@@ -0,0 +1,159 @@
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+
+import heapq
+import math
+
+
+def url_fingerprint(url):
+    """
+    64 bit fingerprint of a url
+    """
+    return int.from_bytes(
+        blake2b(url.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+class FingerprintSet:
+    """
+    Exact set of urls, stored as 64 bit fingerprints.
+
+    Fingerprints live in sorted arrays, 8 bytes per url, instead of a set
+    of url strings. New fingerprints go to a small set buffer that becomes
+    a new sorted run once it grows past `buffer_size`. A run is merged into
+    the one before it while that one is less than twice its size, so the
+    runs double in size, there are only O(log n) of them and each
+    fingerprint is merged O(log n) times. Two distinct urls only collide
+    with a probability of about n² / 2^65.
+    """
+
+    def __init__(self, buffer_size=65536):
+        self.buffer_size = buffer_size
+        self.runs = []
+        self.buffer = set()
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs) + len(self.buffer)
+
+    def __contains__(self, url):
+        return self._contains(url_fingerprint(url))
+
+    def _contains(self, fingerprint):
+        if fingerprint in self.buffer:
+            return True
+
+        for run in self.runs:
+            index = bisect_left(run, fingerprint)
+            if index < len(run) and run[index] == fingerprint:
+                return True
+
+        return False
+
+    def add(self, url):
+        """
+        Add a url, returns False if it was already in the set
+        """
+        fingerprint = url_fingerprint(url)
+
+        if self._contains(fingerprint):
+            return False
+
+        self.buffer.add(fingerprint)
+
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+        return True
+
+    def flush(self):
+        """
+        Turn the buffered fingerprints into a sorted run, merging runs of
+        similar size
+        """
+        if not self.buffer:
+            return
+
+        runs = self.runs
+        runs.append(array("Q", sorted(self.buffer)))
+        self.buffer = set()
+
+        while len(runs) > 1 and len(runs[-2]) < 2 * len(runs[-1]):
+            run = runs.pop()
+            runs[-1] = array("Q", heapq.merge(runs[-1], run))
+
+
+class BloomFilter:
+    """
+    Approximate set of urls.
+
+    Uses about 1.8 bytes per url at a 0.1% false positive rate, whatever
+    the length of the urls. A url that was added is always reported as
+    present, while a url that was not added is wrongly reported as present
+    with probability `error_rate`, as long as no more than `capacity` urls
+    are added. Beyond that the false positive rate grows.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def positions(self, url):
+        # double hashing: k positions from the two halves of one digest
+        digest = blake2b(url.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, url):
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(url)
+        )
+
+    def add(self, url):
+        """
+        Add a url, returns False if it was (probably) already in the filter
+        """
+        bits = self.bits
+        new = False
+
+        for position in self.positions(url):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+
+        if new:
+            self.count += 1
+
+        return new
+
+
+SEEN_SETS = ("exact", "fingerprint", "bloom")
+
+
+def make_seen_set(kind="fingerprint", capacity=1000000, error_rate=0.001):
+    """
+    Returns an empty set of urls: a plain set of strings ("exact"), a
+    FingerprintSet ("fingerprint") or a BloomFilter ("bloom") sized for
+    `capacity` urls at `error_rate`.
+    """
+    if kind == "exact":
+        return set()
+    if kind == "fingerprint":
+        return FingerprintSet()
+    if kind == "bloom":
+        return BloomFilter(capacity, error_rate)
+
+    raise ValueError(f"Unknown seen set {kind!r}, expected one of {SEEN_SETS}")
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from hashlib import blake2b
+
+
+def simhash(features):
+    """
+    64 bit SimHash of weighted (text, weight) features.
+
+    Instead of adding every feature's weight to 64 per-bit totals, weights
+    are tallied per byte value for each of the 8 bytes of the feature hash,
+    and the bit totals are read off those tables once at the end. Returns
+    None when there are no features.
+    """
+    tables = [[0] * 256 for _ in range(8)]
+    total = 0
+
+    for text, weight in features:
+        digest = blake2b(text.encode("utf-8"), digest_size=8).digest()
+        for table, byte in zip(tables, digest):
+            table[byte] += weight
+        total += weight
+
+    if not total:
+        return None
+
+    fingerprint = 0
+
+    for position, table in enumerate(tables):
+        for bit in range(8):
+            mask = 1 << bit
+            ones = sum(weight for value, weight in enumerate(table) if value & mask)
+            if ones * 2 > total:
+                fingerprint |= 1 << (position * 8 + bit)
+
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """
+    LSH index of SimHash fingerprints for near-duplicate detection.
+
+    Fingerprints are split into `bands` bands and bucketed by each band's
+    value. Two fingerprints within `max_distance` bits of each other must
+    agree on at least one band when max_distance < bands, so only pages
+    sharing a bucket are ever compared, not every pair of pages.
+    """
+
+    def __init__(self, max_distance=3, bands=4, bits=64):
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = bits // bands
+        self.bits = bits
+        self.buckets = defaultdict(list)
+        self.urls = defaultdict(list)
+        self.pairs = []
+
+    def band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [
+            (band, (fingerprint >> (band * self.band_bits)) & mask)
+            for band in range(self.bands)
+        ]
+
+    def add(self, url, fingerprint):
+        if fingerprint is None:
+            return
+
+        # identical fingerprints are grouped, so buckets only hold distinct ones
+        if fingerprint in self.urls:
+            self.urls[fingerprint].append(url)
+            return
+
+        self.urls[fingerprint].append(url)
+        seen = set()
+
+        for key in self.band_keys(fingerprint):
+            for candidate in self.buckets[key]:
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+
+                distance = hamming_distance(fingerprint, candidate)
+                if distance <= self.max_distance:
+                    self.pairs.append((candidate, fingerprint, distance))
+
+            self.buckets[key].append(fingerprint)
+
+    def similarity(self, distance):
+        return 1 - distance / self.bits
+
+    def clusters(self):
+        """
+        Returns groups of near-duplicate urls, each with the similarity of
+        the least similar pair that links the group together
+        """
+        parent = {}
+
+        def find(fingerprint):
+            parent.setdefault(fingerprint, fingerprint)
+            while parent[fingerprint] != fingerprint:
+                parent[fingerprint] = parent[parent[fingerprint]]
+                fingerprint = parent[fingerprint]
+            return fingerprint
+
+        worst = {}
+
+        for a, b, distance in self.pairs:
+            root_a, root_b = find(a), find(b)
+            root = min(root_a, root_b)
+            parent[root_a] = parent[root_b] = root
+            worst[root] = max(
+                distance, worst.pop(root_a, 0), worst.pop(root_b, 0)
+            )
+
+        groups = defaultdict(list)
+
+        for fingerprint, urls in self.urls.items():
+            if len(urls) > 1 or fingerprint in parent:
+                groups[find(fingerprint)].extend(urls)
+
+        return [
+            {
+                "urls": sorted(urls),
+                "similarity": self.similarity(worst.get(root, 0)),
+            }
+            for root, urls in groups.items()
+            if len(urls) > 1
+        ]
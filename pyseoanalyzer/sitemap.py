@@ -0,0 +1,160 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+from lxml import etree
+
+import gzip
+import io
+import logging
+import shutil
+import tempfile
+
+
+logger = logging.getLogger(__name__)
+
+SitemapEntry = namedtuple("SitemapEntry", ["url", "lastmod", "priority"])
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# sitemap indexes pointing at sitemap indexes are followed this deep
+MAX_SITEMAP_DEPTH = 5
+
+# the sitemap protocol allows up to 50MB per sitemap, more than a page
+MAX_SITEMAP_SIZE = 50 * 1024 * 1024
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def iter_sitemap(url, client, max_depth=MAX_SITEMAP_DEPTH, _seen=None):
+    """
+    Lazily yield a SitemapEntry for every url in the sitemap at `url`.
+
+    XML sitemaps are read with iterparse and each element is cleared once
+    it has been read, so memory stays flat however many urls a sitemap
+    holds. Sitemap indexes are followed into the sitemaps they list, gzip
+    files are decompressed on the fly, and plain text sitemaps (one url per
+    line) are supported too. The format is detected from the content, not
+    from the url. A sitemap that can not be fetched or parsed ends early
+    instead of failing the crawl.
+    """
+    if _seen is None:
+        _seen = set()
+
+    if url in _seen:
+        return
+    _seen.add(url)
+
+    try:
+        # the body is streamed to a temporary file rather than held in
+        # memory, and parsed from there as the crawl takes its urls. The
+        # connection is not kept open while the crawl works through them.
+        with tempfile.TemporaryFile() as spool:
+            with client.stream(url, max_size=MAX_SITEMAP_SIZE) as (response, body):
+                if response.status != 200:
+                    return
+
+                shutil.copyfileobj(body, spool, COPY_CHUNK_SIZE)
+
+            spool.seek(0)
+
+            for kind, entry in parse_sitemap(open_sitemap(spool)):
+                if kind == "url":
+                    yield entry
+                elif max_depth > 0:
+                    yield from iter_sitemap(entry.url, client, max_depth - 1, _seen)
+    except Exception as e:
+        logger.warning("Error reading sitemap %s: %s", url, e)
+
+
+def open_sitemap(body):
+    """
+    Returns a buffered binary stream of a sitemap body (bytes or a binary
+    file object), decompressing it on the fly if it is gzipped
+    """
+    if isinstance(body, bytes):
+        body = io.BytesIO(body)
+
+    stream = body if hasattr(body, "peek") else io.BufferedReader(body)
+
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        stream = io.BufferedReader(gzip.GzipFile(fileobj=stream))
+
+    return stream
+
+
+def parse_sitemap(stream):
+    """
+    Yield ("url", SitemapEntry) for each page and ("sitemap", SitemapEntry)
+    for each child sitemap of a sitemap index
+    """
+    head = stream.peek(256)[:256].lstrip(b"\xef\xbb\xbf \t\r\n")
+
+    if head.startswith(b"<"):
+        yield from parse_xml_sitemap(stream)
+    else:
+        yield from parse_text_sitemap(stream)
+
+
+def parse_xml_sitemap(stream):
+    for _, element in etree.iterparse(
+        stream,
+        events=("end",),
+        tag=("{*}url", "{*}sitemap"),
+        resolve_entities=False,
+        no_network=True,
+    ):
+        loc = (element.findtext("{*}loc") or "").strip()
+
+        if loc:
+            kind = etree.QName(element).localname
+            entry = SitemapEntry(
+                loc,
+                (element.findtext("{*}lastmod") or "").strip() or None,
+                parse_priority(element.findtext("{*}priority")),
+            )
+            yield "url" if kind == "url" else "sitemap", entry
+
+        # drop the element and everything parsed before it
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def parse_text_sitemap(stream):
+    for line in stream:
+        url = line.decode("utf-8", errors="ignore").strip().lstrip("\ufeff")
+
+        if url:
+            yield "url", SitemapEntry(url, None, None)
+
+
+def parse_priority(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_lastmod(value):
+    """
+    Returns a <lastmod> W3C datetime (a date, or a date and time with an
+    optional timezone) as an aware datetime, or None if it can't be read.
+    Times without a timezone are taken to be UTC.
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value[:10], "%Y-%m-%d")
+        except ValueError:
+            return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed
@@ -0,0 +1,155 @@
+import pickle
+import sqlite3
+import zlib
+
+from threading import Lock
+
+from .sitemap import parse_lastmod
+
+
+class PageStore:
+    """
+    Persistent per-site store of analyzed pages, kept in a SQLite file.
+
+    Each url maps to the content hash of the HTML it was analyzed from and
+    the pickled PageResult, including its word and n-gram counts so the
+    site totals can be rebuilt without parsing the page again. `settings`
+    identifies the analysis options, a result stored under other options
+    is never reused. The sitemap lastmod of the page is kept as well, so a
+    page whose lastmod has not moved on can be reused without fetching it.
+    """
+
+    def __init__(self, path, settings="", commit_every=100):
+        self.path = path
+        self.settings = settings
+        self.commit_every = commit_every
+        self.lock = Lock()
+        self._pending = 0
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, "
+            "content_hash TEXT NOT NULL, "
+            "settings TEXT NOT NULL, "
+            "result BLOB NOT NULL, "
+            "lastmod TEXT)"
+        )
+
+        # stores written before lastmod was recorded
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(pages)")]
+        if "lastmod" not in columns:
+            self.db.execute("ALTER TABLE pages ADD COLUMN lastmod TEXT")
+
+        self.db.commit()
+
+    def get(self, url, content_hash):
+        """
+        Returns the stored PageResult for a url if it was analyzed from the
+        same content with the same settings, otherwise None
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result FROM pages "
+                "WHERE url = ? AND content_hash = ? AND settings = ?",
+                (url, content_hash, self.settings),
+            ).fetchone()
+
+        return self._load(row)
+
+    def get_unchanged(self, url, lastmod):
+        """
+        Returns the stored PageResult for a url if the page's sitemap
+        lastmod has not advanced since it was stored, otherwise None
+        """
+        current = parse_lastmod(lastmod)
+
+        if current is None:
+            return None
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result, lastmod FROM pages WHERE url = ? AND settings = ?",
+                (url, self.settings),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        previous = parse_lastmod(row[1])
+
+        if previous is None or current > previous:
+            return None
+
+        return self._load(row)
+
+    def put(self, result, lastmod=None):
+        data = self._dump(result)
+
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, content_hash, settings, result, lastmod) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (result.url, result.content_hash, self.settings, data, lastmod),
+            )
+            self._pending += 1
+
+            if self._pending >= self.commit_every:
+                self.db.commit()
+                self._pending = 0
+
+    def set_llm_analysis(self, url, llm_analysis):
+        """
+        Attach an LLM analysis that came back after the page was stored.
+        The page itself may have been released by then, so the stored
+        result is updated rather than written again.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result FROM pages WHERE url = ? AND settings = ?",
+                (url, self.settings),
+            ).fetchone()
+            result = self._load(row)
+
+            if result is None:
+                return
+
+            result.llm_analysis = llm_analysis
+            self.db.execute(
+                "UPDATE pages SET result = ? WHERE url = ? AND settings = ?",
+                (self._dump(result), url, self.settings),
+            )
+            self._pending += 1
+
+    def set_lastmod(self, url, lastmod):
+        with self.lock:
+            self.db.execute(
+                "UPDATE pages SET lastmod = ? WHERE url = ?", (lastmod, url)
+            )
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+            self._pending = 0
+
+    def close(self):
+        with self.lock:
+            if self.db is None:
+                return
+
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def _dump(self, result):
+        return zlib.compress(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+
+    def _load(self, row):
+        if row is None:
+            return None
+
+        try:
+            return pickle.loads(zlib.decompress(row[0]))
+        except Exception:
+            return None
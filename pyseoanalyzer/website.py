@@ -1,10 +1,33 @@
-from collections import Counter, defaultdict
+from collections import defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextlib import nullcontext
+from threading import Lock
 from urllib.parse import urlsplit
-from xml.dom import minidom
+import asyncio
+import os
+import pickle
 import socket
+import tempfile
 
-from .http import http
-from .page import Page
+from .frontier import Frontier, normalize_url
+from .http import AsyncHttp
+from .http import http as default_http
+from .llm_analyst import DEFAULT_MAX_INPUT_TOKENS, LLM_CACHE_TTL, LLMStage
+from .ngrams import PackedNgramCounts, Vocabulary, WordCounts
+from .page import Page, PageResult, hash_content, parse_page
+from .page_groups import PageGroups
+from .politeness import MAX_CRAWL_DELAY, PoliteHttp, PolitenessScheduler
+from .robots import RobotsCache, robots_agent
+from .seen import make_seen_set
+from .similarity import SimHashIndex
+from .sitemap import iter_sitemap
+from .store import PageStore
 
 
 # User-agent tokens for AI crawlers/agents that read a site's robots.txt to
@@ -35,6 +58,10 @@ AI_CRAWLER_RETRIEVAL_BOTS = [
 
 AI_CRAWLER_USER_AGENTS = AI_CRAWLER_TRAINING_BOTS + AI_CRAWLER_RETRIEVAL_BOTS
 
+# "page" sends every page to the model, "site" only a sample of each group
+# of similar pages
+LLM_MODES = ("page", "site")
+
 
 class Website:
     def __init__(
@@ -46,21 +73,127 @@ class Website:
         follow_links=False,
         run_llm_analysis=False,
         max_pages=None,
+        workers=1,
+        parse_workers=0,
+        low_memory=False,
+        top_k=None,
+        min_count=5,
+        http=None,
+        store_path=None,
+        checkpoint_path=None,
+        checkpoint_every=100,
+        resume=False,
+        strip_tracking_params=False,
+        sort_query_params=False,
+        seen_set="fingerprint",
+        seen_set_capacity=1000000,
+        seen_set_error_rate=0.001,
+        rate_limit=None,
+        max_per_host=None,
+        respect_crawl_delay=True,
+        max_crawl_delay=MAX_CRAWL_DELAY,
+        respect_robots=True,
+        skip_unchanged=False,
+        llm_concurrency=4,
+        llm_cache_dir=None,
+        llm_cache_ttl=LLM_CACHE_TTL,
+        llm_max_input_tokens=DEFAULT_MAX_INPUT_TOKENS,
+        llm_mode="page",
+        llm_samples_per_group=2,
     ):
-        self.base_url = base_url
+        self.base_url = normalize_url(base_url)
         self.sitemap = sitemap
         self.analyze_headings = analyze_headings
         self.analyze_extra_tags = analyze_extra_tags
         self.follow_links = follow_links
         self.run_llm_analysis = run_llm_analysis
+        # pages are handed to the LLM stage once parsed, the crawl does not
+        # wait for the model
+        self.llm_stage = (
+            LLMStage(
+                llm_concurrency,
+                cache_dir=llm_cache_dir,
+                cache_ttl=llm_cache_ttl,
+                max_input_tokens=llm_max_input_tokens,
+            )
+            if run_llm_analysis
+            else None
+        )
+        self._llm_pending = {}
+        if llm_mode not in LLM_MODES:
+            raise ValueError(
+                f"Unknown LLM mode {llm_mode!r}, expected one of {LLM_MODES}"
+            )
+        # in site mode pages are grouped by url template as they are crawled
+        # and analyzed together once the crawl is done
+        self.page_groups = (
+            PageGroups(llm_samples_per_group)
+            if run_llm_analysis and llm_mode == "site"
+            else None
+        )
+        self.site_llm_analysis = None
         self.max_pages = max_pages
+        self.workers = max(1, workers or 1)
+        self.parse_workers = parse_workers or 0
+        self.low_memory = low_memory
+        self.top_k = top_k
+        self.min_count = min_count
+        # every request, robots.txt and sitemaps included, is rate limited
+        # per host
+        self.respect_crawl_delay = respect_crawl_delay
+        self.scheduler = PolitenessScheduler(
+            rate=rate_limit,
+            max_per_host=max_per_host,
+            max_crawl_delay=max_crawl_delay,
+        )
+        self.http = PoliteHttp(http or default_http, self.scheduler)
+        # parsed robots.txt per host, disallowed urls are never fetched
+        self.respect_robots = respect_robots
+        self.robots = RobotsCache(
+            self.http,
+            on_load=self._robots_loaded,
+            agent=robots_agent(getattr(self.http.client, "user_agent", None)),
+        )
+        # analyzed pages from earlier runs, reused while their HTML is unchanged
+        self.store = (
+            PageStore(store_path, settings=self._store_settings())
+            if store_path
+            else None
+        )
+        self.reused_pages = 0
+        # trust the sitemap lastmod: reuse stored pages without fetching them
+        self.skip_unchanged = skip_unchanged
+        # lastmod and priority of the sitemap urls that have them
+        self.sitemap_entries = {}
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+        self._pages_since_checkpoint = 0
+        # pages are appended to a log next to the checkpoint as they are
+        # added, the checkpoint itself only records how much of it is valid
+        self._page_log = None
         self.crawled_pages = []
-        self.crawled_urls = set()
-        self.page_queue = []
-        self.wordcount = Counter()
-        self.bigrams = Counter()
-        self.trigrams = Counter()
+        # "exact", "fingerprint" or "bloom", see make_seen_set()
+        self.seen_set = seen_set
+        self.seen_set_capacity = seen_set_capacity
+        self.seen_set_error_rate = seen_set_error_rate
+        self.crawled_urls = self._make_seen_set()
+        # urls are normalized and deduplicated as they are queued
+        self.page_queue = Frontier(
+            strip_tracking=strip_tracking_params,
+            sort_query=sort_query_params,
+            seen=self._make_seen_set(),
+        )
+        # every distinct token is stored once, the counters are keyed by id
+        self.vocabulary = Vocabulary()
+        self.wordcount = WordCounts(self.vocabulary)
+        self.bigrams = PackedNgramCounts(self.vocabulary, 2)
+        self.trigrams = PackedNgramCounts(self.vocabulary, 3)
         self.content_hashes = defaultdict(set)
+        self.near_duplicates = SimHashIndex()
+        self._lock = Lock()
+        self._scheduled_count = 0
+        self._in_flight_urls = set()
         self.ai_crawler_access = {
             "llms_txt": False,
             "robots_txt_found": False,
@@ -77,14 +210,6 @@ class Website:
         except (socket.herror, socket.gaierror):
             return False
 
-    def get_text_from_xml(self, nodelist):
-        """
-        Stolen from the minidom documentation
-        """
-        return "".join(
-            node.data for node in nodelist if node.nodeType == node.TEXT_NODE
-        )
-
     def check_ai_crawler_access(self):
         """
         Checks whether the site publishes an llms.txt file and whether its
@@ -114,102 +239,733 @@ class Website:
         base = self.base_url.rstrip("/")
 
         try:
-            llms_response = http.get(f"{base}/llms.txt")
+            llms_response = self.http.get(f"{base}/llms.txt")
             result["llms_txt"] = llms_response.status == 200
         except Exception:
             pass
 
-        try:
-            robots_response = http.get(f"{base}/robots.txt")
-            if robots_response.status == 200:
-                result["robots_txt_found"] = True
-                robots_txt = robots_response.data.decode("utf-8", errors="ignore")
-
-                current_agents = []
-                for line in robots_txt.splitlines():
-                    line = line.split("#", 1)[0].strip()
-                    if not line or ":" not in line:
-                        continue
-
-                    field, _, value = line.partition(":")
-                    field = field.strip().lower()
-                    value = value.strip()
-
-                    if field == "user-agent":
-                        current_agents = [value]
-                    elif field == "disallow" and value == "/" and current_agents:
-                        for agent in current_agents:
-                            for bot in AI_CRAWLER_USER_AGENTS:
-                                if (
-                                    agent.lower() == bot.lower()
-                                    and bot not in result["blocked_ai_bots"]
-                                ):
-                                    result["blocked_ai_bots"].append(bot)
-                                    if bot in AI_CRAWLER_TRAINING_BOTS:
-                                        result["blocked_training_bots"].append(bot)
-                                    elif bot in AI_CRAWLER_RETRIEVAL_BOTS:
-                                        result["blocked_retrieval_bots"].append(bot)
-        except Exception:
-            pass
+        rules = self.robots.get(self.base_url)
+
+        # sites hosted under a path sometimes keep their robots.txt there
+        if rules is None and urlsplit(self.base_url).path not in ("", "/"):
+            rules = self.robots.fetch(base)
+
+        if rules is not None:
+            result["robots_txt_found"] = True
+            root = self.robots.origin(self.base_url) + "/"
+
+            # only a bot's own group counts, the "*" group says nothing
+            # about a site's stance on AI crawlers
+            for bot in AI_CRAWLER_USER_AGENTS:
+                if rules.has_group(bot) and not rules.can_fetch(
+                    root, bot, fallback=False
+                ):
+                    result["blocked_ai_bots"].append(bot)
+                    if bot in AI_CRAWLER_TRAINING_BOTS:
+                        result["blocked_training_bots"].append(bot)
+                    elif bot in AI_CRAWLER_RETRIEVAL_BOTS:
+                        result["blocked_retrieval_bots"].append(bot)
 
         return result
 
+    def seed_queue(self):
+        """
+        Seed the page queue with the sitemap urls and the base url
+        """
+
+        # the sitemap is only read as its urls are taken off the queue
+        if self.sitemap:
+            self.page_queue.add_source(self.sitemap_urls())
+
+        self.page_queue.add(self.base_url)
+
+    def sitemap_urls(self):
+        """
+        Yield the urls of the sitemap, recording their lastmod and priority
+        in `sitemap_entries`
+        """
+        for entry in iter_sitemap(self.sitemap, self.http):
+            if entry.lastmod is not None or entry.priority is not None:
+                url = self.page_queue.normalize(entry.url)
+                self.sitemap_entries[url] = entry._replace(url=url)
+
+            yield entry.url
+
     def crawl(self):
-        self.ai_crawler_access = self.check_ai_crawler_access()
+        try:
+            for page in self.iter_crawl():
+                self.crawled_pages.append(page)
+
+            self.finish_llm_analysis()
+        finally:
+            self.close()
+
+    def iter_llm_results(self, block=False):
+        """
+        Yield each crawled page whose LLM analysis has come back since the
+        last call, with the analysis attached. With `block`, wait for every
+        queued page and yield them as they finish.
+        """
+        if block and self.page_groups:
+            yield from self._site_llm_results()
+
+        pending = self._llm_pending
+
+        if block:
+            finished = as_completed(list(pending))
+        else:
+            finished = [future for future in list(pending) if future.done()]
+
+        for future in finished:
+            page = pending.pop(future)
+
+            try:
+                page.llm_analysis = future.result()
+            except Exception as e:
+                page.warnings.append(f"LLM analysis failed: {e}")
+            else:
+                if self.store is not None:
+                    self.store.set_llm_analysis(page.url, page.llm_analysis)
+
+            yield page
+
+    def _site_llm_results(self):
+        """
+        Run the site-level LLM analysis over the sampled page groups and
+        attach each group's findings to all of its pages
+        """
+        groups = self.page_groups
+        self.page_groups = PageGroups(groups.samples, groups.max_groups)
+        analysis, error = None, None
 
+        if groups.sampled:
+            try:
+                analysis = self.llm_stage.submit_site(dict(groups.sampled)).result()
+            except Exception as e:
+                error = f"LLM analysis failed: {e}"
+
+        self.site_llm_analysis = analysis
+
+        for template, pages in groups.pages.items():
+            group = analysis["groups"].get(template) if analysis else None
+
+            group_error = error
+
+            # no sample of this group could be analyzed
+            if group is not None and "error" in group:
+                group_error = f"LLM analysis failed: {group['error']}"
+                group = None
+
+            for page in pages:
+                if group is not None:
+                    page.llm_analysis = {
+                        "page_group": template,
+                        "sampled_urls": group["sampled_urls"],
+                        "summary": group["summary"],
+                        "quick_wins": analysis["recommendations"]["quick_wins"],
+                        "strategic_recommendations": analysis["recommendations"][
+                            "strategic_recommendations"
+                        ],
+                    }
+                    if self.store is not None:
+                        self.store.set_llm_analysis(page.url, page.llm_analysis)
+                elif group_error is not None:
+                    page.warnings.append(group_error)
+
+                yield page
+
+    def finish_llm_analysis(self):
+        """
+        Wait for the LLM analysis of every crawled page, then stop the stage
+        and close the store
+        """
         try:
-            if self.sitemap:
-                page = http.get(self.sitemap)
-                if self.sitemap.endswith("xml"):
-                    xmldoc = minidom.parseString(page.data.decode("utf-8"))
-                    sitemap_urls = xmldoc.getElementsByTagName("loc")
-                    for url in sitemap_urls:
-                        self.page_queue.append(self.get_text_from_xml(url.childNodes))
-                elif self.sitemap.endswith("txt"):
-                    sitemap_urls = page.data.decode("utf-8").split("\n")
-                    for url in sitemap_urls:
-                        self.page_queue.append(url)
-
-            self.page_queue.append(self.base_url)
-
-            for url in self.page_queue:
-                if url in self.crawled_urls:
-                    continue
-
-                page = Page(
-                    url=url,
-                    base_domain=self.base_url,
-                    analyze_headings=self.analyze_headings,
-                    analyze_extra_tags=self.analyze_extra_tags,
-                    run_llm_analysis=self.run_llm_analysis,
-                )
+            if self.llm_stage is not None:
+                for _ in self.iter_llm_results(block=True):
+                    pass
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stop the LLM stage and close the store once the crawl is over
+        """
+        if self.llm_stage is not None:
+            self.llm_stage.close()
+
+        if self.store is not None:
+            self.store.close()
 
-                if page.parsed_url.netloc != page.base_domain.netloc:
-                    continue
+    def iter_crawl(self):
+        """
+        Crawl the site, yielding each page as soon as it has been analyzed
+        and merged into the site-wide totals. Pages are not kept on the
+        Website, so memory stays flat however many pages are crawled.
+        """
 
-                # Analyze the page and check if successful
-                analysis_successful = page.analyze()
+        resumed = self.resume and self.load_checkpoint()
+
+        if not resumed:
+            self.ai_crawler_access = self.check_ai_crawler_access()
+            self._open_page_log()
+
+        try:
+            if not resumed:
+                self.seed_queue()
 
-                # Only process and add the page if analysis completed
-                if analysis_successful:
-                    self.content_hashes[page.content_hash].add(page.url)
-                    self.wordcount.update(page.wordcount)
-                    self.bigrams.update(page.bigrams)
-                    self.trigrams.update(page.trigrams)
+            # With parse workers, threads only fetch the raw HTML and the
+            # CPU-bound parsing is handed off to a pool of processes. With a
+            # store, the fetched HTML is first checked against the stored
+            # results and only changed pages are analyzed.
+            if self.parse_workers:
+                parser = ProcessPoolExecutor(max_workers=self.parse_workers)
+            else:
+                parser = nullcontext()
 
-                    # Only add links if following is enabled and analysis was successful
-                    if self.follow_links:
-                        self.page_queue.extend(page.links)
+            fetch_first = self.parse_workers or self.store is not None
 
-                    self.crawled_pages.append(page)
-                    self.crawled_urls.add(page.url)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor, parser:
+                in_flight = {}
 
-                    # Stop if we've reached the maximum number of pages
-                    if self.max_pages is not None and len(self.crawled_pages) >= self.max_pages:
+                while True:
+                    self._maybe_checkpoint()
+
+                    fetching = sum(
+                        1 for stage, _ in in_flight.values() if stage == "fetch"
+                    )
+
+                    for page in self._next_pages(len(in_flight), fetching):
+                        if isinstance(page, PageResult):
+                            yield self._add_page(page, reused=True)
+                        elif fetch_first:
+                            in_flight[executor.submit(page.fetch)] = ("fetch", page)
+                        else:
+                            in_flight[executor.submit(page.analyze)] = (
+                                "analyze",
+                                page,
+                            )
+
+                    if not in_flight:
                         break
 
-                # Stop after the first page if not following links, regardless of analysis success
-                if not self.follow_links:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        stage, page = in_flight.pop(future)
+                        result = future.result()
+
+                        if not result:
+                            self._in_flight_urls.discard(page.url)
+                            continue
+
+                        if stage == "fetch":
+                            stored = self._stored_result(page, result)
+
+                            if stored is not None:
+                                yield self._add_page(stored, reused=True)
+                            elif self.parse_workers:
+                                in_flight[
+                                    self._submit_parse(parser, page, result)
+                                ] = ("parse", page)
+                            else:
+                                in_flight[executor.submit(page.analyze, result)] = (
+                                    "analyze",
+                                    page,
+                                )
+                        elif stage == "parse":
+                            content = None
+                            if self.llm_stage is not None:
+                                result, content = result
+                            yield self._add_page(result, content=content)
+                        else:
+                            # Only process and add the page if analysis completed
+                            yield self._add_page(page)
+
+            self._finish_checkpoint()
+        except Exception as e:
+            print(f"Error occurred during crawling: {e}")
+            self.save_checkpoint()
+        except BaseException:
+            # interrupted, keep what was crawled so far for --resume
+            self.save_checkpoint()
+            raise
+        finally:
+            self._close_page_log()
+
+            # the LLM analyses still to come are added to the stored pages,
+            # finish_llm_analysis() closes the store then
+            if self.llm_stage is None:
+                self.close()
+            elif self.store is not None:
+                self.store.commit()
+
+    async def crawl_async(self):
+        """
+        Awaitable version of crawl(). Up to `workers` pages are fetched and
+        analyzed concurrently on the running event loop.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            await self._crawl_pages_async(loop)
+            await loop.run_in_executor(None, self.finish_llm_analysis)
+        finally:
+            self.close()
+
+    async def _crawl_pages_async(self, loop):
+        resumed = self.resume and self.load_checkpoint()
+
+        if not resumed:
+            self.ai_crawler_access = await loop.run_in_executor(
+                None, self.check_ai_crawler_access
+            )
+            self._open_page_log()
+
+        client = AsyncHttp(self.http, max_connections=self._fetch_threads())
+
+        try:
+            if not resumed:
+                await loop.run_in_executor(None, self.seed_queue)
+
+            in_flight = {}
+
+            while True:
+                pages = await loop.run_in_executor(
+                    None, self._take_pages, len(in_flight)
+                )
+
+                for page in pages:
+                    task = asyncio.ensure_future(self._analyze_async(page, client))
+                    in_flight[task] = page
+
+                if not in_flight:
                     break
+
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    page = in_flight.pop(task)
+                    result = task.result()
+
+                    if isinstance(result, PageResult):
+                        self.crawled_pages.append(self._add_page(result, reused=True))
+                    elif result:
+                        self.crawled_pages.append(self._add_page(page))
+                    else:
+                        self._in_flight_urls.discard(page.url)
+
+            self._finish_checkpoint()
         except Exception as e:
             print(f"Error occurred during crawling: {e}")
+            self.save_checkpoint()
+        except BaseException:
+            self.save_checkpoint()
+            raise
+        finally:
+            client.close()
+            self._close_page_log()
+
+            if self.store is not None:
+                self.store.commit()
+
+    def _fetch_threads(self):
+        """
+        The I/O threads crawl_async() fetches with: no more than the
+        requests that can be in flight at once, which the politeness limit
+        and the client's connection pool bound
+        """
+        limits = [
+            self.workers,
+            self.scheduler.max_per_host,
+            getattr(self.http.client, "pool_size", None),
+        ]
+
+        return min(limit for limit in limits if limit)
+
+    def _take_pages(self, pending):
+        """
+        Checkpoint if one is due and take the next pages to fetch off the
+        queue, adding the stored results of unchanged pages straight away.
+        crawl_async() runs this in a thread: reading the sitemap, robots.txt
+        and the store all block.
+        """
+        self._maybe_checkpoint()
+        pages = []
+
+        for page in self._next_pages(pending):
+            if isinstance(page, PageResult):
+                self.crawled_pages.append(self._add_page(page, reused=True))
+            else:
+                pages.append(page)
+
+        return pages
+
+    async def _analyze_async(self, page, client):
+        """
+        Analyze a page on the event loop, or return its stored PageResult if
+        its HTML has not changed since it was stored
+        """
+
+        if self.store is None:
+            return await page.analyze_async(client=client)
+
+        raw_html = await page.fetch_async(client)
+
+        if raw_html is None:
+            return None
+
+        stored = self._stored_result(page, raw_html)
+
+        if stored is not None:
+            return stored
+
+        return await page.analyze_async(raw_html=raw_html, client=client)
+
+    def save_checkpoint(self):
+        """
+        Write the crawl state to `checkpoint_path`: the queue and the
+        crawled urls. The finished pages are already in the page log, only
+        its current length is recorded. Pages that were still in flight are
+        queued again when the crawl is resumed.
+        """
+
+        if not self.checkpoint_path:
+            return
+
+        with self._lock:
+            # a sitemap being read can't be pickled, queue the rest of it
+            self.page_queue.drain()
+
+            if self._page_log is not None:
+                self._page_log.flush()
+                page_log_size = self._page_log.tell()
+            else:
+                page_log_size = 0
+
+            state = {
+                "base_url": self.base_url,
+                "page_queue": self.page_queue,
+                "in_flight": list(self._in_flight_urls),
+                "crawled_urls": self.crawled_urls,
+                "page_log_size": page_log_size,
+                "ai_crawler_access": self.ai_crawler_access,
+                "reused_pages": self.reused_pages,
+                "sitemap_entries": self.sitemap_entries,
+            }
+
+            directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+            # replace the previous checkpoint only once the new one is complete
+            try:
+                with os.fdopen(fd, "wb") as tmp_file:
+                    pickle.dump(state, tmp_file, pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.checkpoint_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+        if self.store is not None:
+            self.store.commit()
+
+        self._pages_since_checkpoint = 0
+
+    def load_checkpoint(self):
+        """
+        Restore the crawl state saved by save_checkpoint(), rebuilding the
+        site totals from the pages logged before it. Returns False if there
+        is no checkpoint for this site.
+        """
+
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+
+        with open(self.checkpoint_path, "rb") as checkpoint_file:
+            state = pickle.load(checkpoint_file)
+
+        if state["base_url"] != self.base_url:
+            return False
+
+        self.page_queue = state["page_queue"]
+        self.page_queue.requeue(state["in_flight"])
+        self.crawled_urls = state["crawled_urls"]
+        self._scheduled_count = len(self.crawled_urls)
+        self._in_flight_urls = set()
+        self.ai_crawler_access = state["ai_crawler_access"]
+        self.reused_pages = state["reused_pages"]
+        self.sitemap_entries = state["sitemap_entries"]
+
+        page_log_size = state["page_log_size"]
+        self.crawled_pages = []
+
+        with open(self._page_log_path(), "rb") as page_log:
+            while page_log.tell() < page_log_size:
+                page, content = pickle.load(page_log)
+
+                self._merge_totals(page)
+
+                if self.low_memory:
+                    page.release()
+
+                # the analyses of the last run were never logged, the pages
+                # are analyzed again (from the LLM cache, if there is one)
+                if content is not None and self.llm_stage is not None:
+                    self._queue_llm(page, content)
+
+                self.crawled_pages.append(page)
+
+        # pages logged after the checkpoint are crawled again
+        self._open_page_log(page_log_size)
+
+        return True
+
+    def _maybe_checkpoint(self):
+        if (
+            self.checkpoint_path
+            and self._pages_since_checkpoint >= self.checkpoint_every
+        ):
+            self.save_checkpoint()
+
+    def _finish_checkpoint(self):
+        # a finished crawl has nothing left to resume
+        self._close_page_log()
+
+        for path in (self.checkpoint_path, self._page_log_path()):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def _page_log_path(self):
+        return f"{self.checkpoint_path}.pages" if self.checkpoint_path else None
+
+    def _open_page_log(self, size=0):
+        if not self.checkpoint_path:
+            return
+
+        self._page_log = open(self._page_log_path(), "r+b" if size else "wb")
+        self._page_log.truncate(size)
+        self._page_log.seek(size)
+
+    def _close_page_log(self):
+        if self._page_log is not None:
+            self._page_log.close()
+            self._page_log = None
+
+    def _next_pages(self, pending, fetching=None):
+        """
+        Take pages off the queue until `workers` fetches are in flight,
+        never scheduling more than `max_pages` pages beyond those already
+        crawled or pending. With `skip_unchanged`, the stored PageResult is
+        yielded instead of a Page for urls whose sitemap lastmod has not
+        advanced, and must be added before the next page is taken.
+        """
+
+        if fetching is None:
+            fetching = pending
+
+        while (
+            self.page_queue
+            and fetching < self.workers
+            and not self._page_limit_reached(pending)
+            # Without link following only the first page is ever analyzed
+            and (self.follow_links or not self._scheduled_count)
+        ):
+            url = self.page_queue.pop()
+
+            if url in self.crawled_urls:
+                continue
+
+            page = self._build_page(url)
+
+            if page.parsed_url.netloc != page.base_domain.netloc:
+                continue
+
+            if self.respect_robots and not self.robots.allowed(url):
+                continue
+
+            stored = self._unchanged_result(url)
+
+            if stored is not None:
+                self._scheduled_count += 1
+                yield stored
+                continue
+
+            self._scheduled_count += 1
+            self._in_flight_urls.add(url)
+            pending += 1
+            fetching += 1
+            yield page
+
+    def _submit_parse(self, parser, page, raw_html):
+        return parser.submit(
+            parse_page,
+            page.url,
+            self.base_url,
+            raw_html,
+            analyze_headings=self.analyze_headings,
+            analyze_extra_tags=self.analyze_extra_tags,
+            top_k=self.top_k,
+            min_count=self.min_count,
+            content_hash=page.content_hash,
+            keep_content=self.llm_stage is not None,
+        )
+
+    def _build_page(self, url):
+        return Page(
+            url=url,
+            base_domain=self.base_url,
+            analyze_headings=self.analyze_headings,
+            analyze_extra_tags=self.analyze_extra_tags,
+            top_k=self.top_k,
+            min_count=self.min_count,
+            http=self.http,
+        )
+
+    def _robots_loaded(self, origin, rules):
+        if rules is None or not self.respect_crawl_delay:
+            return
+
+        self.scheduler.set_crawl_delay(
+            urlsplit(origin).netloc, rules.crawl_delay(self.robots.agent)
+        )
+
+    def _make_seen_set(self):
+        return make_seen_set(
+            self.seen_set, self.seen_set_capacity, self.seen_set_error_rate
+        )
+
+    def _store_settings(self):
+        return repr(
+            (
+                self.analyze_headings,
+                self.analyze_extra_tags,
+                self.run_llm_analysis,
+                self.top_k,
+                self.min_count,
+            )
+        )
+
+    def _lastmod(self, url):
+        entry = self.sitemap_entries.get(url)
+        return entry.lastmod if entry is not None else None
+
+    def _unchanged_result(self, url):
+        if not self.skip_unchanged or self.store is None:
+            return None
+
+        lastmod = self._lastmod(url)
+
+        if lastmod is None:
+            return None
+
+        return self._reusable(self.store.get_unchanged(url, lastmod))
+
+    def _stored_result(self, page, raw_html):
+        if self.store is None:
+            return None
+
+        content_hash = page.content_hash or hash_content(raw_html, page.encoding)
+        return self._reusable(self.store.get(page.url, content_hash))
+
+    def _reusable(self, stored):
+        # a page whose LLM analysis never came back is analyzed again
+        if (
+            stored is not None
+            and self.llm_stage is not None
+            and not stored.llm_analysis
+        ):
+            return None
+
+        return stored
+
+    def _page_limit_reached(self, pending=0):
+        return (
+            self.max_pages is not None
+            and len(self.crawled_urls) + pending >= self.max_pages
+        )
+
+    def _add_page(self, page, reused=False, content=None):
+        """
+        Merge a successfully analyzed page into the site-wide totals and
+        return the slim PageResult that is kept in its place. `reused` marks
+        a result that came out of the store rather than a fresh analysis.
+        `content` is the extracted content the LLM stage analyzes.
+        """
+        if isinstance(page, Page):
+            content = page.content
+            page = PageResult.from_page(page)
+
+        queue_llm = self.llm_stage is not None and not reused
+
+        if queue_llm:
+            page.llm_analysis = {}
+
+        # stored before a low_memory release, the LLM analysis is added to
+        # the stored result once it is back
+        if self.store is not None:
+            lastmod = self._lastmod(page.url)
+
+            if not reused:
+                self.store.put(page, lastmod)
+            elif lastmod is not None:
+                self.store.set_lastmod(page.url, lastmod)
+
+        if reused:
+            self.reused_pages += 1
+
+        with self._lock:
+            self._merge_totals(page)
+
+            # Only add links if following is enabled and analysis was successful
+            if self.follow_links:
+                self.page_queue.extend(page.links)
+
+            self.crawled_urls.add(page.url)
+            self._in_flight_urls.discard(page.url)
+            self._pages_since_checkpoint += 1
+
+            # logged before the release, the totals are rebuilt from it on
+            # resume. Pages waiting for the LLM are logged with their
+            # content, or {}, so they can be queued again.
+            if self._page_log is not None:
+                pickle.dump(
+                    (page, (content or {}) if queue_llm else None),
+                    self._page_log,
+                    pickle.HIGHEST_PROTOCOL,
+                )
+
+        # everything heavy is in the site totals now
+        if self.low_memory:
+            page.release()
+
+        if queue_llm:
+            self._queue_llm(page, content)
+
+        return page
+
+    def _queue_llm(self, page, content):
+        if self.page_groups is not None:
+            self.page_groups.add(page, content)
+        else:
+            self._llm_pending[self.llm_stage.submit(content)] = page
+
+    def _merge_totals(self, page):
+        self.content_hashes[page.content_hash].add(page.url)
+        self.near_duplicates.add(page.url, page.simhash)
+        self._merge_ngrams(page)
+
+    def _merge_ngrams(self, page):
+        """
+        Merge a page's counts into the site-wide counters. Only the page's
+        own vocabulary is translated to site ids, the n-gram keys are never
+        turned into strings.
+        """
+        site_ids = self.vocabulary.intern_all(page.ngrams.tokens)
+
+        for word, cnt in page.wordcount.items():
+            self.wordcount.add((self.vocabulary.intern(word),), cnt)
+
+        self.bigrams.merge(page.ngrams, site_ids)
+        self.trigrams.merge(page.ngrams, site_ids)
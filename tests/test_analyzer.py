@@ -1,7 +1,16 @@
+import asyncio
+import inspect
 import time
 import pytest
-from unittest.mock import patch, MagicMock
-from pyseoanalyzer.analyzer import analyze, calc_total_time
+from unittest.mock import AsyncMock, patch, MagicMock
+from pyseoanalyzer.analyzer import (
+    DEFAULT_OPTIONS,
+    HTTP_OPTIONS,
+    analyze,
+    analyze_async,
+    calc_total_time,
+    iter_analyze,
+)
 
 
 # --- Test calc_total_time ---
@@ -34,6 +43,18 @@ def create_mock_page(url, title, description, word_count, content_hash):
     return page
 
 
+def website_kwargs(sitemap=None, **options):
+    """
+    The arguments analyze() passes to Website for http://example.com, with
+    `options` on top of the defaults
+    """
+    kwargs = {**DEFAULT_OPTIONS, **options}
+    for name in HTTP_OPTIONS:
+        kwargs.pop(name)
+
+    return dict(base_url="http://example.com", sitemap=sitemap, http=None, **kwargs)
+
+
 # Basic test using mocking
 @patch("pyseoanalyzer.analyzer.Website")
 def test_analyze_basic(MockWebsite):
@@ -53,14 +74,7 @@ def test_analyze_basic(MockWebsite):
 
     # --- Assertions ---
     # Check Website constructor call
-    MockWebsite.assert_called_once_with(
-        base_url="http://example.com",
-        sitemap=None,
-        analyze_headings=False,
-        analyze_extra_tags=False,
-        follow_links=False,
-        run_llm_analysis=False,
-    )
+    MockWebsite.assert_called_once_with(**website_kwargs(follow_links=False))
     # Check crawl was called
     mock_site_instance.crawl.assert_called_once()
 
@@ -116,12 +130,7 @@ def test_analyze_duplicates(MockWebsite):
 
     # --- Assertions ---
     MockWebsite.assert_called_once_with(
-        base_url="http://example.com",
-        sitemap=None,
-        analyze_headings=False,
-        analyze_extra_tags=False,
-        follow_links=True,  # Check default
-        run_llm_analysis=False,
+        **website_kwargs(follow_links=True)  # Check default
     )
     mock_site_instance.crawl.assert_called_once()
 
@@ -158,12 +167,13 @@ def test_analyze_arguments_passthrough(MockWebsite):
     # --- Assertions ---
     # Check Website constructor call reflects arguments
     MockWebsite.assert_called_once_with(
-        base_url="http://example.com",
-        sitemap="http://example.com/sitemap.xml",
-        analyze_headings=True,
-        analyze_extra_tags=True,
-        follow_links=False,
-        run_llm_analysis=True,
+        **website_kwargs(
+            sitemap="http://example.com/sitemap.xml",
+            analyze_headings=True,
+            analyze_extra_tags=True,
+            follow_links=False,
+            run_llm_analysis=True,
+        )
     )
     mock_site_instance.crawl.assert_called_once()
 
@@ -197,3 +207,103 @@ def test_analyze_keyword_filtering(MockWebsite):
     # Check sorting (descending by count)
     counts = [kw["count"] for kw in output["keywords"]]
     assert counts == sorted(counts, reverse=True)
+
+
+@patch("pyseoanalyzer.analyzer.Website")
+def test_iter_analyze_streams_pages_then_summary(MockWebsite):
+    mock_site_instance = MockWebsite.return_value
+    mock_page1 = create_mock_page("http://example.com/a", "A", "Desc", 10, "h1")
+    mock_page2 = create_mock_page("http://example.com/b", "B", "Desc", 20, "h2")
+    mock_site_instance.iter_crawl.return_value = iter([mock_page1, mock_page2])
+    mock_site_instance.content_hashes = {"h1": ["http://example.com/a"]}
+    mock_site_instance.wordcount = {"word": 5}
+    mock_site_instance.bigrams = {}
+    mock_site_instance.trigrams = {}
+
+    records = list(iter_analyze("http://example.com"))
+
+    assert records[0] == ("page", mock_page1.as_dict.return_value)
+    assert records[1] == ("page", mock_page2.as_dict.return_value)
+    summary = dict(records[2:])
+    assert summary["keywords"] == [{"word": "word", "count": 5}]
+    assert summary["duplicate_pages"] == []
+    assert "total_time" in summary
+    mock_site_instance.crawl.assert_not_called()
+
+
+@patch("pyseoanalyzer.analyzer.Website")
+def test_analyze_top_k_and_min_count(MockWebsite):
+    mock_site_instance = MockWebsite.return_value
+    mock_site_instance.crawled_pages = []
+    mock_site_instance.content_hashes = {}
+    mock_site_instance.wordcount = {"high": 10, "medium": 5, "low": 3, "one": 1}
+    mock_site_instance.bigrams = {"bi high": 8, "bi low": 2}
+    mock_site_instance.trigrams = {"tri high a": 9}
+
+    output = analyze("http://example.com", top_k=3, min_count=3)
+
+    assert output["keywords"] == [
+        {"word": "high", "count": 10},
+        {"word": "tri high a", "count": 9},
+        {"word": "bi high", "count": 8},
+    ]
+
+
+@patch("pyseoanalyzer.analyzer.Website")
+def test_analyze_async_passes_every_option(MockWebsite):
+    mock_site_instance = MockWebsite.return_value
+    mock_site_instance.crawl_async = AsyncMock()
+    mock_site_instance.crawled_pages = []
+    mock_site_instance.content_hashes = {}
+    mock_site_instance.wordcount = {}
+    mock_site_instance.bigrams = {}
+    mock_site_instance.trigrams = {}
+
+    asyncio.run(analyze_async("http://example.com", parse_workers=2))
+
+    kwargs = MockWebsite.call_args.kwargs
+    assert kwargs["parse_workers"] == 2
+    assert kwargs["workers"] == 100
+    # 100 pages in flight share the default client and its 10 connections
+    assert kwargs == website_kwargs(workers=100, parse_workers=2)
+    mock_site_instance.crawl_async.assert_awaited_once()
+
+
+@patch("pyseoanalyzer.analyzer.Website")
+def test_analyze_keeps_the_positional_arguments(MockWebsite):
+    mock_site_instance = MockWebsite.return_value
+    mock_site_instance.crawled_pages = []
+    mock_site_instance.content_hashes = {}
+    mock_site_instance.wordcount = {}
+    mock_site_instance.bigrams = {}
+    mock_site_instance.trigrams = {}
+
+    analyze(
+        "http://example.com", None, True, True, False, True, 10, checkpoint_every=5
+    )
+
+    MockWebsite.assert_called_once_with(
+        **website_kwargs(
+            analyze_headings=True,
+            analyze_extra_tags=True,
+            follow_links=False,
+            run_llm_analysis=True,
+            max_pages=10,
+            checkpoint_every=5,
+        )
+    )
+
+
+def test_entry_points_share_the_analyze_signature():
+    assert list(inspect.signature(iter_analyze).parameters) == list(
+        inspect.signature(analyze).parameters
+    )
+    assert inspect.signature(analyze_async).parameters["workers"].default == 100
+
+    with pytest.raises(TypeError):
+        analyze("http://example.com", None, True, True, False, True, 10, 1)
+
+
+def test_analyze_rejects_unknown_options():
+    with pytest.raises(TypeError):
+        analyze("http://example.com", follow_link=True)
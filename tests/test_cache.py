@@ -0,0 +1,30 @@
+import os
+
+from pyseoanalyzer.cache import DiskCache
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=200)
+
+    cache.set("a", {}, b"x" * 80)
+    cache.set("b", {}, b"x" * 80)
+    # make the access order explicit, file times may be too coarse to tell
+    os.utime(cache.path("a", "json"), (1, 1))
+    os.utime(cache.path("b", "json"), (2, 2))
+    cache.set("c", {}, b"x" * 80)
+
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.size <= 200
+
+
+def test_disk_cache_expires_entries_after_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60)
+
+    cache.set("a", {}, b"x")
+    assert cache.get("a") == ({}, b"x")
+
+    os.utime(cache.path("a", "body"), (1, 1))
+    assert cache.get("a") is None
+    assert not os.path.exists(cache.path("a", "json"))
+    assert cache.size == 0
@@ -0,0 +1,53 @@
+from pyseoanalyzer.frontier import Frontier, normalize_url, remove_dot_segments
+
+
+def test_normalize_url_canonical_form():
+    assert normalize_url("HTTPS://Example.COM:443/a/./b/../c#top") == (
+        "https://example.com/a/c"
+    )
+    assert normalize_url("http://example.com:8080") == "http://example.com:8080/"
+    assert normalize_url("http://example.com:80/?b=2&a=1") == (
+        "http://example.com/?b=2&a=1"
+    )
+
+
+def test_normalize_url_resolves_relative_links():
+    base = "https://example.com/blog/post?page=2"
+
+    assert normalize_url("other", base) == "https://example.com/blog/other"
+    assert normalize_url("../about/", base) == "https://example.com/about/"
+    assert normalize_url("?page=3", base) == "https://example.com/blog/post?page=3"
+    assert normalize_url("//example.com/x", base) == "https://example.com/x"
+
+
+def test_normalize_url_query_options():
+    url = "https://example.com/p?utm_source=news&b=2&gclid=abc&a=1"
+
+    assert normalize_url(url, strip_tracking=True) == "https://example.com/p?b=2&a=1"
+    assert normalize_url(url, strip_tracking=True, sort_query=True) == (
+        "https://example.com/p?a=1&b=2"
+    )
+
+
+def test_normalize_url_leaves_other_schemes():
+    assert normalize_url("mailto:someone@example.com") == "mailto:someone@example.com"
+
+
+def test_remove_dot_segments():
+    assert remove_dot_segments("/a/b/c/./../../g") == "/a/g"
+    assert remove_dot_segments("/..") == "/"
+    assert remove_dot_segments("/a/.") == "/a/"
+
+
+def test_frontier_admits_each_url_once():
+    frontier = Frontier(strip_tracking=True)
+
+    assert frontier.add("https://example.com/a")
+    assert not frontier.add("https://EXAMPLE.com/a#section")
+    assert not frontier.add("https://example.com:443/b/../a?utm_medium=email")
+    assert not frontier.add("")
+    frontier.extend(["https://example.com/b", "https://example.com/a"])
+
+    assert list(frontier) == ["https://example.com/a", "https://example.com/b"]
+    assert frontier.pop() == "https://example.com/a"
+    assert len(frontier) == 1
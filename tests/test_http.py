@@ -1,5 +1,227 @@
+import asyncio
+import io
+import threading
+
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from unittest.mock import patch
+
+from urllib3 import HTTPResponse
+
 from pyseoanalyzer import http
+from pyseoanalyzer.analyzer import analyze, build_http
 
 
 def test_http():
     assert http.http.get("https://www.sethserver.com/tests/utf8.html")
+
+
+def _response(status, body=b"", headers=None):
+    return HTTPResponse(
+        body=io.BytesIO(body),
+        headers=headers or {},
+        status=status,
+        preload_content=False,
+    )
+
+
+def test_cached_get_revalidates_with_etag(tmp_path):
+    client = http.Http(cache_dir=str(tmp_path))
+    url = "https://example.com/"
+    first = _response(
+        200, b"<html>hello</html>", {"ETag": '"v1"', "Content-Type": "text/html"}
+    )
+
+    with patch.object(client.http, "request", return_value=first) as request:
+        assert client.get(url).data == b"<html>hello</html>"
+        assert "If-None-Match" not in request.call_args.kwargs["headers"]
+
+    with patch.object(
+        client.http, "request", return_value=_response(304)
+    ) as request:
+        response = client.get(url)
+
+    headers = request.call_args.kwargs["headers"]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["User-Agent"] == "Mozilla/5.0"
+    assert response.status == 200
+    assert response.data == b"<html>hello</html>"
+    assert response.headers["Content-Type"] == "text/html"
+
+
+def test_cached_get_replaces_changed_page(tmp_path):
+    client = http.Http(cache_dir=str(tmp_path))
+    url = "https://example.com/"
+    old = _response(200, b"old", {"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    new = _response(200, b"new", {"Last-Modified": "Tue, 02 Jan 2024 00:00:00 GMT"})
+
+    with patch.object(client.http, "request", side_effect=[old, new]) as request:
+        client.get(url)
+        assert client.get(url).data == b"new"
+
+    assert (
+        request.call_args.kwargs["headers"]["If-Modified-Since"]
+        == "Mon, 01 Jan 2024 00:00:00 GMT"
+    )
+    assert client.cache.get(url)[1] == b"new"
+
+
+def test_request_skips_body_of_unwanted_content_type():
+    client = http.Http()
+    body = io.BytesIO(b"%PDF" + b"x" * 1000)
+    response = HTTPResponse(
+        body=body,
+        headers={"Content-Type": "application/pdf"},
+        status=200,
+        preload_content=False,
+    )
+
+    with patch.object(client.http, "request", return_value=response):
+        result = client.get("https://example.com/a.pdf", content_types=("text/html",))
+
+    assert result.status == 200
+    assert result.data == b""
+    # the connection was dropped instead of reading the body
+    assert body.closed
+
+
+def test_request_returns_empty_bytes_for_an_empty_body():
+    client = http.Http()
+
+    with patch.object(client.http, "request", return_value=_response(204)):
+        result = client.get("https://example.com/")
+
+    assert result.status == 204
+    assert result.data == b""
+    assert not result.truncated
+
+
+def test_stream_reads_the_body_lazily_up_to_max_size():
+    client = http.Http()
+    body = io.BytesIO(b"x" * 1000)
+    response = HTTPResponse(
+        body=body, headers={}, status=200, preload_content=False
+    )
+
+    with patch.object(client.http, "request", return_value=response) as request:
+        with client.stream("https://example.com/", max_size=300) as (result, data):
+            assert result.status == 200
+            assert body.tell() == 0
+            assert data.read() == b"x" * 300
+
+    assert request.call_args.kwargs["preload_content"] is False
+    assert body.closed
+
+
+def test_request_truncates_large_bodies():
+    client = http.Http(max_body_size=100)
+    response = _response(200, b"x" * 1000, {"Content-Type": "text/html"})
+
+    with patch.object(client.http, "request", return_value=response):
+        result = client.get("https://example.com/", content_types=("text/html",))
+
+    assert result.data == b"x" * 100
+    assert result.truncated
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    pages = {
+        "/": b'<html><head><title>Home</title></head><body><a href="/about">About</a></body></html>',
+        "/about": b"<html><head><title>About</title></head><body>About us</body></html>",
+    }
+    user_agents = []
+
+    def do_GET(self):
+        self.user_agents.append(self.headers.get("User-Agent"))
+        body = self.pages.get(self.path)
+
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SiteHandler)
+    _SiteHandler.user_agents = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_injected_client_crawls_local_site(local_site):
+    client = http.Http(user_agent="test-agent/1.0", pool_size=2, retries=0)
+
+    output = analyze(f"{local_site}/", follow_links=True, http=client)
+
+    assert sorted(page["url"] for page in output["pages"]) == [
+        f"{local_site}/",
+        f"{local_site}/about",
+    ]
+    assert set(_SiteHandler.user_agents) == {"test-agent/1.0"}
+
+
+def test_build_http_sizes_pool_for_workers():
+    client = build_http(workers=32)
+
+    assert client.http.connection_pool_kw["maxsize"] == 32
+    # the number of hosts kept is independent of the connections per host
+    assert client.http.pools._maxsize == http.DEFAULT_NUM_POOLS
+    assert http.Http(num_pools=3).http.pools._maxsize == 3
+    assert build_http() is None
+
+    injected = http.Http()
+    assert build_http(injected, workers=32) is injected
+
+
+def test_async_http_close_stops_the_executor():
+    client = http.AsyncHttp(http.Http(), max_connections=2)
+
+    client.close()
+
+    with pytest.raises(RuntimeError):
+        client.executor.submit(print)
+
+
+def test_async_http_threads_match_the_connection_pool():
+    assert http.AsyncHttp(http.Http(pool_size=4)).executor._max_workers == 4
+
+
+def test_async_http_close_cancels_requests_that_have_not_started():
+    started = threading.Event()
+    finish = threading.Event()
+
+    def get(url, **kwargs):
+        started.set()
+        finish.wait(5)
+        return url
+
+    inner = http.Http()
+    client = http.AsyncHttp(inner, max_connections=1)
+
+    async def crawl():
+        with patch.object(inner, "get", side_effect=get):
+            first = asyncio.ensure_future(client.get("https://example.com/1"))
+            second = asyncio.ensure_future(client.get("https://example.com/2"))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+
+            client.close()
+            finish.set()
+
+            return await first, await asyncio.gather(second, return_exceptions=True)
+
+    first, (second,) = asyncio.run(crawl())
+
+    assert first == "https://example.com/1"
+    assert isinstance(second, asyncio.CancelledError)
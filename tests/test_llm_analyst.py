@@ -1,5 +1,18 @@
+import asyncio
+import threading
+
 import pytest
-from pyseoanalyzer.llm_analyst import LLMSEOEnhancer
+from pyseoanalyzer.llm_analyst import (
+    CHARS_PER_TOKEN,
+    ConversationAnalysis,
+    CredibilityAnalysis,
+    EntityAnalysis,
+    LLMSEOEnhancer,
+    LLMStage,
+    PlatformPresence,
+    SEORecommendations,
+    build_llm_payload,
+)
 from langchain_anthropic import ChatAnthropic
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
@@ -35,3 +48,258 @@ async def test_enhance_seo_analysis(seo_data):
     assert "conversation_analysis" in result["detailed_analysis"]
     assert "cross_platform_presence" in result["detailed_analysis"]
     assert "recommendations" in result["detailed_analysis"]
+
+
+def test_ainvoke_limits_concurrent_calls():
+    enhancer = LLMSEOEnhancer(max_concurrency=2)
+    state = {"active": 0, "peak": 0}
+
+    class SlowChain:
+        async def ainvoke(self, data):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return data
+
+    enhancer.entity_chain = SlowChain()
+
+    async def run():
+        return await asyncio.gather(*(enhancer._ainvoke("entity", i) for i in range(6)))
+
+    assert asyncio.run(run()) == list(range(6))
+    assert state["peak"] == 2
+
+
+def test_llm_stage_runs_in_background():
+    release = threading.Event()
+
+    class FakeEnhancer:
+        async def enhance_seo_analysis(self, seo_data):
+            import asyncio
+
+            while not release.is_set():
+                await asyncio.sleep(0.001)
+            return {"summary": seo_data["title"]}
+
+    stage = LLMStage(enhancer=FakeEnhancer())
+    futures = [stage.submit({"title": title}) for title in ("a", "b")]
+
+    # submitting never waits for the model
+    assert not any(future.done() for future in futures)
+
+    release.set()
+    assert [future.result(timeout=5) for future in futures] == [
+        {"summary": "a"},
+        {"summary": "b"},
+    ]
+    stage.close()
+    assert stage.loop is None
+
+
+def test_cached_chain_results_skip_the_model(tmp_path):
+    calls = []
+
+    class CountingChain:
+        async def ainvoke(self, data):
+            calls.append(data)
+            return EntityAnalysis(
+                entity_assessment="ok",
+                knowledge_panel_readiness=80,
+                key_improvements=["schema"],
+            )
+
+    def run(data, **kwargs):
+        enhancer = LLMSEOEnhancer(cache_dir=str(tmp_path), **kwargs)
+        enhancer.entity_chain = CountingChain()
+        return asyncio.run(enhancer._ainvoke("entity", data))
+
+    first = run('{"text": "page"}')
+    # a new enhancer, as on the next run, reads the result from disk
+    assert run('{"text": "page"}') == first
+    assert len(calls) == 1
+
+    run('{"text": "changed page"}')
+    assert len(calls) == 2
+
+    # expired entries are fetched again
+    run('{"text": "page"}', cache_ttl=-1)
+    assert len(calls) == 3
+
+
+def test_build_llm_payload_keeps_used_fields_compact():
+    page = {
+        "url": "https://example.com/",
+        "title": "Test Title",
+        "bigrams": {"test title": 1},
+        "content_hash": "abc",
+        "text": "Some text.",
+    }
+
+    payload = build_llm_payload(page)
+
+    assert json.loads(payload) == {
+        "url": "https://example.com/",
+        "title": "Test Title",
+        "text": "Some text.",
+    }
+    assert "\n" not in payload and ", " not in payload
+
+
+def test_build_llm_payload_truncates_text_to_budget():
+    page = {"title": "Long page", "text": "word " * 5000, "comments": "reply " * 500}
+
+    payload = build_llm_payload(page, max_tokens=500)
+    data = json.loads(payload)
+
+    assert len(payload) <= 500 * CHARS_PER_TOKEN
+    assert data["title"] == "Long page"
+    assert data["text"].startswith("word word")
+    assert data["text"].endswith("[...]")
+    # comments are cut before the page text
+    assert "comments" not in data or len(data["comments"]) < len(data["text"])
+    assert build_llm_payload(page, max_tokens=500) == payload
+
+
+def test_build_llm_payload_condenses_site_results():
+    site = {
+        "pages": [
+            {
+                "url": f"https://example.com/{i}",
+                "title": f"Page {i}",
+                "bigrams": {"a b": 1},
+                "warnings": ["Missing description"],
+            }
+            for i in range(200)
+        ],
+        "keywords": [{"word": f"w{i}", "count": i} for i in range(100)],
+        "total_time": 1.5,
+    }
+
+    data = json.loads(build_llm_payload(site, max_tokens=1000))
+
+    assert "total_time" not in data
+    assert len(data["keywords"]) == 20
+    assert data["pages"][0] == {"url": "https://example.com/0", "title": "Page 0"}
+    assert len(data["pages"]) + data["omitted_pages"] == 200
+    assert len(build_llm_payload(site, max_tokens=1000)) <= 1000 * CHARS_PER_TOKEN
+
+
+def test_enhance_site_analysis_calls_scale_with_groups():
+    results = {
+        "entity": EntityAnalysis(
+            entity_assessment="ok",
+            knowledge_panel_readiness=60,
+            key_improvements=["a"],
+        ),
+        "credibility": CredibilityAnalysis(
+            credibility_assessment="ok", neeat_scores={"n": 60}, trust_signals=[]
+        ),
+        "conversation": ConversationAnalysis(
+            conversation_readiness="ok",
+            query_patterns=[],
+            engagement_score=40,
+            gaps=["b"],
+        ),
+        "platform": PlatformPresence(
+            platform_coverage={},
+            visibility_scores={"search": 50},
+            optimization_opportunities=[],
+        ),
+        "recommendations": SEORecommendations(
+            strategic_recommendations=["plan"],
+            quick_wins=["fix titles"],
+            long_term_strategy=[],
+            priority_matrix={},
+        ),
+    }
+    calls = []
+
+    class FakeChain:
+        def __init__(self, name):
+            self.name = name
+
+        async def ainvoke(self, data):
+            calls.append((self.name, data))
+            return results[self.name]
+
+    enhancer = LLMSEOEnhancer()
+    for name in results:
+        setattr(enhancer, f"{name}_chain", FakeChain(name))
+
+    groups = {
+        "/blog/{slug}": [
+            {"url": "https://example.com/blog/a", "text": "a"},
+            {"url": "https://example.com/blog/b", "text": "b"},
+        ],
+        "/": [{"url": "https://example.com/", "text": "home"}],
+    }
+
+    analysis = asyncio.run(enhancer.enhance_site_analysis(groups))
+
+    # four chains per sample and one recommendations pass for the site
+    assert len(calls) == 3 * 4 + 1
+    assert [name for name, _ in calls].count("recommendations") == 1
+    blog = analysis["groups"]["/blog/{slug}"]
+    assert blog["sampled_urls"] == [
+        "https://example.com/blog/a",
+        "https://example.com/blog/b",
+    ]
+    assert blog["summary"]["entity_score"] == 60
+    assert analysis["recommendations"]["quick_wins"] == ["fix titles"]
+    assert json.loads(calls[-1][1])["/"]["improvements"] == ["a", "b"]
+
+
+def test_enhance_site_analysis_leaves_out_failed_samples():
+    enhancer = LLMSEOEnhancer()
+
+    async def analyze_page(seo_data):
+        if seo_data["text"] != "ok":
+            raise ValueError("rate limited")
+        return {
+            "entity_analysis": {
+                "knowledge_panel_readiness": 60,
+                "key_improvements": [],
+            },
+            "credibility_analysis": {"neeat_scores": {"n": 60}},
+            "conversation_analysis": {"engagement_score": 40, "gaps": []},
+            "cross_platform_presence": {"visibility_scores": {"search": 50}},
+        }
+
+    class Recommendations:
+        def model_dump(self):
+            return {"quick_wins": [], "strategic_recommendations": []}
+
+    async def ainvoke(name, data):
+        return Recommendations()
+
+    enhancer._analyze_page = analyze_page
+    enhancer._ainvoke = ainvoke
+
+    groups = {
+        "/blog/{slug}": [
+            {"url": "https://example.com/blog/a", "text": "ok"},
+            {"url": "https://example.com/blog/b", "text": "fails"},
+        ],
+        "/": [{"url": "https://example.com/", "text": "fails"}],
+    }
+
+    analysis = asyncio.run(enhancer.enhance_site_analysis(groups))
+
+    assert analysis["groups"]["/blog/{slug}"]["sampled_urls"] == [
+        "https://example.com/blog/a"
+    ]
+    assert analysis["groups"]["/blog/{slug}"]["summary"]["entity_score"] == 60
+    assert analysis["groups"]["/"] == {"error": "rate limited"}
+    assert analysis["recommendations"] == {
+        "quick_wins": [],
+        "strategic_recommendations": [],
+    }
+
+    # nothing to recommend from when every sample failed
+    del groups["/blog/{slug}"]
+    analysis = asyncio.run(enhancer.enhance_site_analysis(groups))
+    assert analysis == {
+        "groups": {"/": {"error": "rate limited"}},
+        "recommendations": None,
+    }
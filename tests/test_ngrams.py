@@ -0,0 +1,96 @@
+from pyseoanalyzer.ngrams import (
+    NgramCounts,
+    PackedNgramCounts,
+    Vocabulary,
+    WordCounts,
+    most_common,
+)
+
+
+def test_from_tokens_counts_packed_ngrams():
+    counts = NgramCounts.from_tokens("the cat saw the cat sleep".split())
+
+    assert counts.strings(1) == {"the": 2, "cat": 2, "saw": 1, "sleep": 1}
+    assert counts.strings(2) == {
+        "the cat": 2,
+        "cat saw": 1,
+        "saw the": 1,
+        "cat sleep": 1,
+    }
+    assert counts.strings(3)["the cat saw"] == 1
+    assert all(isinstance(key, int) for key in counts.trigrams)
+
+
+def test_decode_round_trips_keys():
+    counts = NgramCounts.from_tokens("a b c a b c".split())
+
+    for key in counts.trigrams:
+        assert counts.ngram(key, 3) in {"a b c", "b c a", "c a b"}
+
+
+def test_empty_text():
+    counts = NgramCounts.from_tokens([])
+
+    assert counts.strings(2) == {}
+    assert counts.strings(3) == {}
+
+
+def test_site_counters_share_one_vocabulary():
+    vocabulary = Vocabulary()
+    words = WordCounts(vocabulary)
+    bigrams = PackedNgramCounts(vocabulary, 2, buffer_size=2)
+
+    for text in ["red fox", "red fox", "blue fox", "red hen"]:
+        ids = vocabulary.intern_all(text.split())
+        bigrams.add(ids)
+        for token_id in ids:
+            words.add((token_id,))
+
+    assert len(vocabulary) == 4
+    assert words["fox"] == 3
+    assert words["missing"] == 0
+    assert bigrams["red fox"] == 2
+    assert dict(bigrams.items()) == {"red fox": 2, "blue fox": 1, "red hen": 1}
+    assert len(bigrams) == 3
+
+
+def test_packed_counts_overflow_ids():
+    trigrams = PackedNgramCounts(Vocabulary(), 3)
+    big = 1 << trigrams.bits
+
+    trigrams.add((big, 1, 2), 2)
+    trigrams.add((1, 2, 3))
+
+    assert trigrams.count_ids((big, 1, 2)) == 2
+    assert trigrams.count_ids((1, 2, 3)) == 1
+
+
+def test_packed_counts_keep_few_geometric_runs():
+    vocabulary = Vocabulary()
+    bigrams = PackedNgramCounts(vocabulary, 2, buffer_size=4)
+    ids = vocabulary.intern_all([str(i) for i in range(50)])
+
+    for i in range(len(ids) - 1):
+        bigrams.add((ids[i], ids[i + 1]))
+        bigrams.add((ids[0], ids[1]))
+
+    sizes = [len(keys) for keys, _ in bigrams.runs]
+    assert all(a >= 2 * b for a, b in zip(sizes, sizes[1:]))
+    assert len(sizes) <= 5
+    assert bigrams.count_ids((ids[0], ids[1])) == 50
+    assert bigrams.count_ids((ids[1], ids[2])) == 1
+
+    assert len(bigrams) == 49
+    assert len(bigrams.runs) == 1
+
+
+def test_most_common_prunes_before_building_strings():
+    vocabulary = Vocabulary()
+    bigrams = PackedNgramCounts(vocabulary, 2)
+
+    for text, cnt in [("a b", 7), ("b c", 1), ("c d", 5), ("d e", 9)]:
+        bigrams.add(vocabulary.intern_all(text.split()), cnt)
+
+    assert bigrams.most_common(2) == [("d e", 9), ("a b", 7)]
+    assert bigrams.most_common(min_count=5) == [("d e", 9), ("a b", 7), ("c d", 5)]
+    assert most_common({"x": 3, "y": 1}, min_count=2) == [("x", 3)]
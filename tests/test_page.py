@@ -1,4 +1,11 @@
+import hashlib
+import json
+
+import lxml.html as lh
+from urllib3 import HTTPResponse
+
 from pyseoanalyzer import page
+from pyseoanalyzer.llm_analyst import build_llm_payload
 
 
 def test_page_init():
@@ -31,30 +38,55 @@ def test_analyze():
 
 
 def test_analyze_html_lang_missing():
-    from bs4 import BeautifulSoup
-
     p = page.Page(url="https://example.com/", base_domain="https://example.com/")
-    soup = BeautifulSoup(
-        "<html><head><title>Test</title></head><body><p>Hello</p></body></html>",
-        "html.parser",
+    dom = lh.document_fromstring(
+        "<html><head><title>Test</title></head><body><p>Hello</p></body></html>"
     )
-    p.analyze_html_lang(soup)
+    p.analyze_html_lang(dom)
     assert len(p.warnings) == 1
     assert "lang" in p.warnings[0].lower()
 
 
 def test_analyze_html_lang_present():
-    from bs4 import BeautifulSoup
-
     p = page.Page(url="https://example.com/", base_domain="https://example.com/")
-    soup = BeautifulSoup(
-        '<html lang="en"><head><title>Test</title></head><body><p>Hello</p></body></html>',
-        "html.parser",
+    dom = lh.document_fromstring(
+        '<html lang="en"><head><title>Test</title></head><body><p>Hello</p></body></html>'
     )
-    p.analyze_html_lang(soup)
+    p.analyze_html_lang(dom)
     assert len(p.warnings) == 0
 
 
+def test_analyze_raw_html_single_tree():
+    p = page.Page(
+        url="https://example.com/",
+        base_domain="https://example.com/",
+        analyze_headings=True,
+        analyze_extra_tags=True,
+    )
+
+    assert p.analyze(
+        raw_html=(
+            '<html lang="en"><head><title>Raw HTML test page</title>'
+            '<meta property="OG:Title" content="Upper case og tag">'
+            '<meta name="Keywords" content="spam, spam"></head>'
+            "<body><!-- <h1>Commented out</h1> --><h2>Sub heading</h2>"
+            "<p>Enough paragraph text for trafilatura to extract something "
+            "useful from this small test document.</p>"
+            '<img src="/logo.png"><a href="/about">About</a></body></html>'
+        )
+    )
+
+    assert "Missing og:title" not in p.warnings
+    assert "Each page should have at least one h1 tag" in p.warnings
+    assert "Image missing alt tag: /logo.png" in p.warnings
+    assert any(w.startswith("Keywords should be avoided") for w in p.warnings)
+    assert p.headings == {"h2": ["Sub heading"]}
+    assert p.additional_info["title"] == ["Raw HTML test page"]
+    assert type(p.additional_info["title"][0]) is str
+    assert p.links == ["https://example.com/about"]
+    assert "paragraph" in p.wordcount
+
+
 def test_analyze_with_llm():
     p = page.Page(
         url="https://www.sethserver.com/",
@@ -66,3 +98,39 @@ def test_analyze_with_llm():
 
     assert "seth" in p.title.lower()
     assert "summary" in p.llm_analysis
+
+
+def test_decode_response_hashes_raw_bytes():
+    body = "<html><body>café</body></html>".encode("latin-1")
+    response = HTTPResponse(
+        body=body,
+        headers={"Content-Type": "text/html; charset=latin-1"},
+        status=200,
+    )
+    response.truncated = True
+
+    p = page.Page(url="https://example.com/", base_domain="https://example.com/")
+
+    assert "café" in p.decode_response(response)
+    assert p.content_hash == hashlib.sha1(body).hexdigest()
+    assert p.warnings[0].startswith("Page is larger than")
+
+
+def test_analyze_html_keeps_metadata_in_content():
+    p = page.Page(url="https://example.com/post", base_domain="https://example.com/")
+    p.analyze_html(
+        '<html lang="en"><head><title>Metadata title</title>'
+        '<meta name="description" content="A page about metadata">'
+        '<meta name="author" content="Jane Doe"></head>'
+        "<body><h1>Heading</h1><p>Some words in a paragraph that trafilatura "
+        "can extract as the text of the page.</p></body></html>"
+    )
+
+    assert p.content["title"] == p.title
+    assert p.content["description"] == "A page about metadata"
+    assert "paragraph" in p.content["text"]
+
+    payload = json.loads(build_llm_payload(p.content))
+    assert payload["url"] == "https://example.com/post"
+    assert payload["title"] == p.title
+    assert payload["description"] == "A page about metadata"
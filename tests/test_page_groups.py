@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from pyseoanalyzer.page_groups import OTHER_GROUP, PageGroups, url_template
+
+
+def test_url_template():
+    assert url_template("https://example.com/") == "/"
+    assert url_template("https://example.com/about") == "/{slug}"
+    assert url_template("https://example.com/blog/my-post") == "/blog/{slug}"
+    assert url_template("https://example.com/Blog/2024/05/x") == "/blog/{n}/{n}/{slug}"
+    assert url_template("https://example.com/products/123?color=red") == (
+        "/products/{n}"
+    )
+    assert url_template("https://example.com/p/3f2a9c1e-77aa") == "/p/{id}"
+
+
+def _page(url):
+    return SimpleNamespace(url=url, title="Title", description="")
+
+
+def test_page_groups_sample_the_first_pages_of_each_template():
+    groups = PageGroups(samples=2)
+
+    for slug in ("a", "b", "c"):
+        groups.add(_page(f"https://example.com/blog/{slug}"), {"text": slug})
+    groups.add(_page("https://example.com/"), {"text": "home"})
+    groups.add(_page("https://example.com/blog/d"), None)
+
+    assert len(groups) == 2
+    assert len(groups.pages["/blog/{slug}"]) == 4
+    assert [s["text"] for s in groups.sampled["/blog/{slug}"]] == ["a", "b"]
+    assert groups.sampled["/"][0]["url"] == "https://example.com/"
+
+
+def test_page_groups_cap_the_number_of_groups():
+    groups = PageGroups(samples=1, max_groups=2)
+
+    for path in ("/", "/blog/a", "/shop/1", "/docs/a"):
+        groups.add(_page(f"https://example.com{path}"), {"text": path})
+
+    assert set(groups.pages) == {"/", "/blog/{slug}", OTHER_GROUP}
+    assert len(groups.pages[OTHER_GROUP]) == 2
+    assert len(groups.sampled[OTHER_GROUP]) == 1
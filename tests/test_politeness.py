@@ -0,0 +1,153 @@
+import threading
+
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+from pyseoanalyzer.politeness import (
+    PoliteHttp,
+    PolitenessScheduler,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _scheduler(clock, **kwargs):
+    return PolitenessScheduler(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_token_bucket_spaces_out_requests():
+    bucket = TokenBucket(rate=2, burst=2)
+
+    assert [bucket.reserve(0) for _ in range(4)] == [0, 0, 0.5, 1.0]
+    assert bucket.reserve(10) == 0
+
+
+def test_scheduler_rate_limits_each_host_separately():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, rate=1)
+
+    for url in ["https://a.com/1", "https://b.com/1", "https://a.com/2"]:
+        scheduler.acquire(url)
+        scheduler.release(url, 200)
+
+    assert clock.sleeps == [1.0]
+
+
+def test_scheduler_honours_crawl_delay():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, rate=10)
+    scheduler.set_crawl_delay("a.com", 5)
+
+    for url in ["https://a.com/1", "https://a.com/2"]:
+        scheduler.acquire(url)
+        scheduler.release(url, 200)
+
+    assert clock.sleeps == [5.0]
+
+
+def test_scheduler_caps_crawl_delay(caplog):
+    clock = FakeClock()
+    scheduler = _scheduler(clock, max_crawl_delay=30)
+    scheduler.set_crawl_delay("a.com", 86400)
+
+    for url in ["https://a.com/1", "https://a.com/2"]:
+        scheduler.acquire(url)
+        scheduler.release(url, 200)
+
+    assert clock.sleeps == [30.0]
+    assert "capped at 30s" in caplog.text
+
+
+def test_scheduler_backs_off_on_429():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, backoff=2)
+
+    scheduler.acquire("https://a.com/1")
+    scheduler.release("https://a.com/1", 429)
+    scheduler.acquire("https://a.com/1")
+    scheduler.release("https://a.com/1", 503, retry_after=10)
+    scheduler.acquire("https://a.com/1")
+    scheduler.release("https://a.com/1", 200)
+
+    assert clock.sleeps == [2.0, 10.0]
+    assert scheduler.hosts["a.com"].failures == 0
+
+
+def test_scheduler_caps_concurrency_per_host():
+    scheduler = PolitenessScheduler(max_per_host=1)
+    scheduler.acquire("https://a.com/1")
+    acquired = threading.Event()
+
+    def second_request():
+        scheduler.acquire("https://a.com/2")
+        acquired.set()
+
+    thread = threading.Thread(target=second_request)
+    thread.start()
+
+    assert not acquired.wait(0.1)
+    scheduler.release("https://a.com/1", 200)
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Thu, 01 Jan 1970 00:01:00 GMT", now=0) == 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_polite_http_retries_after_backoff():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    client = MagicMock()
+    client.get.side_effect = [
+        MagicMock(status=429, headers={"Retry-After": "3"}),
+        MagicMock(status=200, headers={}),
+    ]
+
+    response = PoliteHttp(client, scheduler).get("https://a.com/")
+
+    assert response.status == 200
+    assert client.get.call_count == 2
+    assert clock.sleeps == [3.0]
+
+
+def test_polite_http_stream_retries_and_holds_the_host_until_read():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    responses = iter(
+        [
+            MagicMock(status=503, headers={"Retry-After": "2"}),
+            MagicMock(status=200, headers={}),
+        ]
+    )
+    client = MagicMock()
+
+    @contextmanager
+    def stream(url, **kwargs):
+        yield next(responses), MagicMock()
+
+    client.stream.side_effect = stream
+
+    with PoliteHttp(client, scheduler).stream("https://a.com/") as (response, _):
+        assert response.status == 200
+        assert scheduler.hosts["a.com"].active == 1
+
+    assert scheduler.hosts["a.com"].active == 0
+    assert client.stream.call_count == 2
+    assert clock.sleeps == [2.0]
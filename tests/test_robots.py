@@ -0,0 +1,94 @@
+import io
+
+from unittest.mock import patch
+
+from urllib3 import HTTPResponse
+
+from pyseoanalyzer.http import Http
+from pyseoanalyzer.robots import (
+    ROBOTS_USER_AGENT,
+    RobotsCache,
+    RobotsRules,
+    pattern_to_regex,
+    robots_agent,
+)
+
+
+ROBOTS_TXT = """
+# comment
+User-agent: Googlebot
+User-agent: pyseoanalyzer
+Disallow: /search
+Allow: /search/about
+Disallow: /*.json$
+Crawl-delay: 1.5
+
+User-agent: *
+Disallow: /
+Allow: /$
+Disallow:
+
+User-agent: pyseoanalyzer
+Disallow: /tmp/
+"""
+
+
+def test_groups_are_shared_and_merged():
+    rules = RobotsRules(ROBOTS_TXT)
+
+    assert rules.has_group("googlebot")
+    assert rules.has_group("PYSEOANALYZER")
+    assert not rules.has_group("GPTBot")
+    assert rules.crawl_delay() == 1.5
+    assert rules.crawl_delay("somebot") is None
+    assert not rules.can_fetch("https://example.com/tmp/x")
+    assert rules.can_fetch("https://example.com/tmp/x", "googlebot")
+
+
+def test_longest_match_wins_and_allow_wins_ties():
+    rules = RobotsRules(ROBOTS_TXT)
+
+    assert not rules.can_fetch("https://example.com/search?q=1")
+    assert rules.can_fetch("https://example.com/search/about")
+    assert rules.can_fetch("https://example.com/data.json?x=1")
+    assert not rules.can_fetch("https://example.com/data.json")
+
+    tie = RobotsRules("User-agent: *\nDisallow: /page\nAllow: /page\n")
+    assert tie.can_fetch("https://example.com/page")
+
+
+def test_fallback_group():
+    rules = RobotsRules(ROBOTS_TXT)
+
+    assert rules.can_fetch("https://example.com/", "somebot")
+    assert not rules.can_fetch("https://example.com/about", "somebot")
+    assert rules.can_fetch("https://example.com/about", "somebot", fallback=False)
+
+
+def test_pattern_to_regex():
+    assert pattern_to_regex("/a*b$") == r"/a.*b\Z"
+    assert pattern_to_regex("/a.b") == r"/a\.b"
+
+
+def test_empty_robots_allows_everything():
+    assert RobotsRules("").can_fetch("https://example.com/anything")
+
+
+def test_empty_robots_txt_response_allows_everything():
+    client = Http()
+    empty = HTTPResponse(
+        body=io.BytesIO(b""), headers={}, status=200, preload_content=False
+    )
+
+    with patch.object(client.http, "request", return_value=empty):
+        robots = RobotsCache(client)
+        assert robots.allowed("https://example.com/anything")
+
+    assert robots.rules["https://example.com"] is not None
+
+
+def test_robots_agent_is_the_product_token_of_the_user_agent():
+    assert robots_agent("MyBot/1.2 (+https://example.com/bot)") == "MyBot"
+    assert robots_agent("my_crawler") == "my_crawler"
+    assert robots_agent("Mozilla/5.0") == ROBOTS_USER_AGENT
+    assert robots_agent(None) == ROBOTS_USER_AGENT
@@ -0,0 +1,64 @@
+import pytest
+
+from pyseoanalyzer.frontier import Frontier
+from pyseoanalyzer.seen import BloomFilter, FingerprintSet, make_seen_set
+
+
+def test_fingerprint_set_is_exact_across_flushes():
+    seen = FingerprintSet(buffer_size=10)
+    urls = [f"https://example.com/{i}" for i in range(100)]
+
+    assert all(seen.add(url) for url in urls)
+    assert not seen.add(urls[0])
+    assert len(seen) == 100
+    assert sum(len(run) for run in seen.runs) >= 90
+    assert all(url in seen for url in urls)
+    assert "https://example.com/100" not in seen
+
+
+def test_fingerprint_set_keeps_few_geometric_runs():
+    seen = FingerprintSet(buffer_size=8)
+
+    for i in range(8 * 100):
+        seen.add(f"https://example.com/{i}")
+    seen.flush()
+
+    sizes = [len(run) for run in seen.runs]
+    assert sum(sizes) == 800
+    # each run is at least twice the size of the next, so there are few
+    assert all(a >= 2 * b for a, b in zip(sizes, sizes[1:]))
+    assert len(sizes) <= 7
+    assert all(list(run) == sorted(run) for run in seen.runs)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    seen = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f"https://example.com/{i}" for i in range(1000)]
+
+    for url in urls:
+        seen.add(url)
+
+    assert all(url in seen for url in urls)
+
+    false_positives = sum(
+        f"https://example.com/other/{i}" in seen for i in range(10000)
+    )
+    assert false_positives < 300
+    assert len(seen.bits) < 1300
+
+
+def test_make_seen_set():
+    assert isinstance(make_seen_set("exact"), set)
+    assert isinstance(make_seen_set(), FingerprintSet)
+    assert make_seen_set("bloom", capacity=10, error_rate=0.1).capacity == 10
+
+    with pytest.raises(ValueError):
+        make_seen_set("unknown")
+
+
+def test_frontier_with_fingerprint_set():
+    frontier = Frontier(seen=FingerprintSet())
+
+    frontier.extend(["https://example.com/a", "https://example.com/a#b"])
+
+    assert list(frontier) == ["https://example.com/a"]
@@ -0,0 +1,43 @@
+from pyseoanalyzer.similarity import SimHashIndex, hamming_distance, simhash
+
+
+def _features(text):
+    words = text.split()
+    return [(" ".join(words[i : i + 3]), 1) for i in range(len(words) - 2)]
+
+
+BASE = (
+    "our spring collection of lightweight running shoes is designed for "
+    "long distance comfort with breathable mesh uppers cushioned soles and "
+    "a durable rubber outsole that grips on wet roads and dry trails alike "
+    "every pair is tested by real runners before it reaches the store"
+)
+
+
+def test_simhash_is_stable_and_close_for_small_edits():
+    edited = BASE.replace("spring", "summer")
+
+    assert simhash(_features(BASE)) == simhash(_features(BASE))
+    assert hamming_distance(simhash(_features(BASE)), simhash(_features(edited))) < 16
+    assert simhash([]) is None
+
+
+def test_index_clusters_near_duplicates_only():
+    index = SimHashIndex()
+    fingerprint = simhash(_features(BASE))
+
+    index.add("https://example.com/a", fingerprint)
+    index.add("https://example.com/b", fingerprint ^ 0b101)
+    index.add("https://example.com/c", fingerprint)
+    index.add("https://example.com/other", fingerprint ^ ((1 << 64) - 1))
+
+    assert index.clusters() == [
+        {
+            "urls": [
+                "https://example.com/a",
+                "https://example.com/b",
+                "https://example.com/c",
+            ],
+            "similarity": 1 - 2 / 64,
+        }
+    ]
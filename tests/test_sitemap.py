@@ -0,0 +1,106 @@
+import gzip
+import io
+
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+from pyseoanalyzer.frontier import Frontier
+from pyseoanalyzer.sitemap import SitemapEntry, iter_sitemap
+
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://example.com/a</loc>
+    <lastmod>2026-01-02</lastmod>
+    <priority>0.8</priority>
+  </url>
+  <url><loc> https://example.com/b </loc></url>
+</urlset>
+"""
+
+INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/pages.xml.gz</loc></sitemap>
+  <sitemap><loc>https://example.com/more</loc></sitemap>
+  <sitemap><loc>https://example.com/index.xml</loc></sitemap>
+</sitemapindex>
+"""
+
+
+def _client(bodies):
+    @contextmanager
+    def stream(url, **kwargs):
+        if url not in bodies:
+            yield MagicMock(status=404), io.BytesIO(b"")
+        else:
+            yield MagicMock(status=200), io.BufferedReader(io.BytesIO(bodies[url]))
+
+    client = MagicMock()
+    client.stream.side_effect = stream
+    return client
+
+
+def test_iter_sitemap_reads_urlset():
+    client = _client({"https://example.com/sitemap.xml": URLSET})
+
+    assert list(iter_sitemap("https://example.com/sitemap.xml", client)) == [
+        SitemapEntry("https://example.com/a", "2026-01-02", 0.8),
+        SitemapEntry("https://example.com/b", None, None),
+    ]
+
+
+def test_iter_sitemap_follows_indexes_gzip_and_text():
+    client = _client(
+        {
+            "https://example.com/index.xml": INDEX,
+            "https://example.com/pages.xml.gz": gzip.compress(URLSET),
+            # a text sitemap without a telling suffix
+            "https://example.com/more": b"https://example.com/c\n\nhttps://example.com/d\n",
+        }
+    )
+
+    urls = [e.url for e in iter_sitemap("https://example.com/index.xml", client)]
+
+    assert urls == [
+        "https://example.com/a",
+        "https://example.com/b",
+        "https://example.com/c",
+        "https://example.com/d",
+    ]
+    # the index listing itself is not read twice
+    assert client.stream.call_count == 3
+
+
+def test_iter_sitemap_survives_broken_sitemaps(capsys, caplog):
+    client = _client({"https://example.com/sitemap.xml": b"<urlset><url><loc>"})
+
+    assert list(iter_sitemap("https://example.com/sitemap.xml", client)) == []
+    # reported as a warning, stdout is left to the json output
+    assert "Error reading sitemap https://example.com/sitemap.xml" in caplog.text
+    assert capsys.readouterr().out == ""
+    assert list(iter_sitemap("https://example.com/missing.xml", client)) == []
+
+
+def test_frontier_reads_sources_lazily_and_first():
+    frontier = Frontier()
+    read = []
+
+    def source():
+        for url in [
+            "https://example.com/a",
+            "https://example.com/",
+            "https://example.com/b",
+        ]:
+            read.append(url)
+            yield url
+
+    frontier.add_source(source())
+    frontier.add("https://example.com/")
+
+    assert read == []
+    assert frontier.pop() == "https://example.com/a"
+    assert read == ["https://example.com/a"]
+
+    frontier.drain()
+    assert list(frontier) == ["https://example.com/b", "https://example.com/"]
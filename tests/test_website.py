@@ -1,6 +1,90 @@
+import asyncio
+import os
+import pickle
+import threading
+
+from unittest.mock import AsyncMock, MagicMock, patch
+from urllib.parse import urlsplit
+
+import pytest
+
+from pyseoanalyzer.http import AsyncHttp, Http
+from pyseoanalyzer.llm_analyst import LLMStage
+from pyseoanalyzer.ngrams import NgramCounts
+from pyseoanalyzer.page import Page, PageResult
+from pyseoanalyzer.robots import RobotsCache, RobotsRules
+from pyseoanalyzer.sitemap import SitemapEntry
+from pyseoanalyzer.store import PageStore
 from pyseoanalyzer.website import Website
 
 
+BASE_URL = "https://example.com/"
+
+
+@pytest.fixture
+def robots_txt(monkeypatch):
+    """
+    Serve robots.txt from a string instead of fetching it, no robots.txt
+    unless the test sets one
+    """
+    robots = {"text": None}
+
+    def fetch(self, origin):
+        return RobotsRules(robots["text"]) if robots["text"] is not None else None
+
+    monkeypatch.setattr(RobotsCache, "fetch", fetch)
+    return robots
+
+
+def page_html(
+    title,
+    text="Some words in a paragraph that trafilatura can extract.",
+    links=(),
+):
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return (
+        f'<html lang="en"><head><title>{title}</title></head><body>'
+        f"<h1>Heading</h1><p>{text}</p>{anchors}</body></html>"
+    )
+
+
+@pytest.fixture
+def crawl(robots_txt):
+    """
+    Crawl BASE_URL with the given Website options, serving `html` (a
+    string, or a function of the url) instead of fetching the pages.
+    `enhancer` stands in for the LLM. The urls fetched by the last crawl
+    are in `crawl.fetched`.
+    """
+
+    def crawl(html, enhancer=None, sitemap=None, **options):
+        crawl.fetched = []
+        site = Website(base_url=BASE_URL, sitemap=sitemap, **options)
+
+        if enhancer is not None:
+            site.llm_stage = LLMStage(enhancer=enhancer)
+
+        def fetch(page):
+            crawl.fetched.append(page.url)
+            return html(page.url) if callable(html) else html
+
+        with patch.object(
+            site, "check_ai_crawler_access", return_value={}
+        ), patch.object(Page, "fetch", autospec=True, side_effect=fetch):
+            site.crawl()
+
+        return site
+
+    return crawl
+
+
+def crawl_fake_pages(site, build_page):
+    with patch.object(site, "check_ai_crawler_access", return_value={}), patch.object(
+        site, "_build_page", side_effect=build_page
+    ):
+        site.crawl()
+
+
 def test_check_ai_crawler_access_allows_and_has_llms_txt():
     site = Website(
         base_url="https://alexander-k-eliot.github.io/ai-visibility-check-free/",
@@ -71,3 +155,552 @@ def test_website_init_sets_default_ai_crawler_access():
         "blocked_training_bots": [],
         "blocked_retrieval_bots": [],
     }
+
+
+def _fake_page(url, links):
+    page = MagicMock()
+    page.url = url
+    page.parsed_url = urlsplit(url)
+    page.base_domain = urlsplit(BASE_URL)
+    page.content_hash = url
+    page.wordcount = {"word": 1}
+    page.ngrams = NgramCounts.from_tokens(["word", "in", "a", "page"])
+    page.links = links
+    page.analyze.return_value = True
+    return page
+
+
+def test_crawl_with_workers_honours_max_pages(robots_txt):
+    site = Website(
+        base_url=BASE_URL, sitemap=None, follow_links=True, max_pages=7, workers=4
+    )
+
+    def build_page(url):
+        return _fake_page(url, [f"https://example.com/{i}" for i in range(20)])
+
+    crawl_fake_pages(site, build_page)
+
+    assert len(site.crawled_pages) == 7
+    assert len(site.crawled_urls) == 7
+    assert site.wordcount["word"] == 7
+    assert site.bigrams["word in"] == 7
+    assert dict(site.trigrams.items()) == {"word in a": 7, "in a page": 7}
+
+
+def test_crawl_async_honours_max_pages(robots_txt):
+    site = Website(
+        base_url=BASE_URL, sitemap=None, follow_links=True, max_pages=5, workers=50
+    )
+
+    def build_page(url):
+        page = _fake_page(url, [f"https://example.com/{i}" for i in range(20)])
+        page.analyze_async = AsyncMock(return_value=True)
+        return page
+
+    with patch.object(site, "check_ai_crawler_access", return_value={}), patch.object(
+        site, "_build_page", side_effect=build_page
+    ), patch.object(AsyncHttp, "close", autospec=True) as close:
+        asyncio.run(site.crawl_async())
+
+    assert len(site.crawled_pages) == 5
+    assert all(p.analyze_async.await_count == 1 for p in site.crawled_pages)
+    # the client's I/O threads are stopped once the crawl is done
+    close.assert_called_once()
+
+
+def test_crawl_async_fetch_threads_are_bounded_by_connections():
+    assert Website(base_url=BASE_URL, sitemap=None, workers=50)._fetch_threads() == 10
+    assert (
+        Website(
+            base_url=BASE_URL, sitemap=None, workers=50, max_per_host=3
+        )._fetch_threads()
+        == 3
+    )
+    assert Website(base_url=BASE_URL, sitemap=None, workers=2)._fetch_threads() == 2
+
+
+def test_crawl_async_reads_the_sitemap_off_the_event_loop(robots_txt):
+    site = Website(
+        base_url=BASE_URL,
+        sitemap="https://example.com/sitemap.xml",
+        follow_links=True,
+    )
+    threads = []
+
+    def entries(url, client):
+        for name in ["a", "b"]:
+            threads.append(threading.current_thread())
+            yield SitemapEntry(f"https://example.com/{name}", None, None)
+
+    with patch.object(site, "check_ai_crawler_access", return_value={}), patch(
+        "pyseoanalyzer.website.iter_sitemap", side_effect=entries
+    ), patch.object(
+        Page, "fetch_async", autospec=True, return_value=page_html("Async page")
+    ):
+        asyncio.run(site.crawl_async())
+
+    assert len(site.crawled_pages) == 3
+    assert threads and threading.main_thread() not in threads
+
+
+def test_crawl_async_closes_the_store(tmp_path, robots_txt):
+    site = Website(
+        base_url=BASE_URL, sitemap=None, store_path=str(tmp_path / "pages.sqlite")
+    )
+
+    with patch.object(site, "check_ai_crawler_access", return_value={}), patch.object(
+        Page, "fetch_async", autospec=True, return_value=page_html("Async page")
+    ):
+        asyncio.run(site.crawl_async())
+
+    assert len(site.crawled_pages) == 1
+    assert site.store.db is None
+
+
+def test_interrupted_crawl_closes_the_store(tmp_path, crawl):
+    def fetch_killed(url):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt), patch.object(
+        PageStore, "close", autospec=True, side_effect=PageStore.close
+    ) as close:
+        crawl(fetch_killed, store_path=str(tmp_path / "pages.sqlite"))
+
+    close.assert_called()
+
+
+def test_crawl_with_parse_workers_returns_page_results(robots_txt):
+    html = page_html(
+        "Parse worker test page",
+        "Some words in a paragraph that trafilatura can extract for the parse "
+        "worker to count.",
+    )
+    site = Website(
+        base_url=BASE_URL, sitemap=None, follow_links=False, workers=2, parse_workers=2
+    )
+
+    def build_page(url):
+        page = _fake_page(url, [])
+        page.fetch.return_value = html
+        return page
+
+    crawl_fake_pages(site, build_page)
+
+    assert len(site.crawled_pages) == 1
+    assert isinstance(site.crawled_pages[0], PageResult)
+    assert site.crawled_pages[0].as_dict()["url"] == BASE_URL
+    assert site.wordcount["paragraph"] == 1
+
+
+def test_crawl_low_memory_keeps_slim_results(crawl):
+    html = page_html(
+        "Low memory test page",
+        "Some words in a paragraph that trafilatura can extract for the low "
+        "memory crawl.",
+        links=["/next"],
+    )
+
+    site = crawl(html, follow_links=True, max_pages=2, low_memory=True)
+
+    assert [p.url for p in site.crawled_pages] == [
+        "https://example.com/",
+        "https://example.com/next",
+    ]
+    assert all(isinstance(p, PageResult) for p in site.crawled_pages)
+    assert site.crawled_pages[0].ngrams is None
+    assert site.crawled_pages[0].as_dict()["bigrams"] == {}
+    assert site.wordcount["paragraph"] == 2
+    assert site.bigrams["low memory"] == 2
+
+
+def test_crawl_reuses_stored_results_for_unchanged_pages(tmp_path, crawl):
+    html = page_html(
+        "Stored page",
+        "Some words in a paragraph that trafilatura can extract for the stored "
+        "crawl.",
+        links=["/next"],
+    )
+    changed = html.replace("stored crawl", "changed crawl")
+    pages = {"https://example.com/": html, "https://example.com/next": html}
+    options = dict(
+        follow_links=True, max_pages=2, store_path=str(tmp_path / "pages.sqlite")
+    )
+
+    def crawl_counting_analyses():
+        with patch.object(
+            Page, "analyze_html", autospec=True, side_effect=Page.analyze_html
+        ) as analyze_html:
+            site = crawl(pages.get, **options)
+        return site, analyze_html.call_count
+
+    site, analyzed = crawl_counting_analyses()
+    assert analyzed == 2
+    assert site.reused_pages == 0
+
+    pages["https://example.com/next"] = changed
+    site, analyzed = crawl_counting_analyses()
+
+    assert analyzed == 1
+    assert site.reused_pages == 1
+    assert site.store.db is None
+    assert [p.url for p in site.crawled_pages] == [
+        "https://example.com/",
+        "https://example.com/next",
+    ]
+    assert site.bigrams["stored crawl"] == 1
+    assert site.bigrams["changed crawl"] == 1
+
+
+def test_crawl_resumes_from_checkpoint(tmp_path, crawl):
+    html = page_html(
+        "Checkpoint page",
+        "Some words in a paragraph that trafilatura can extract for the "
+        "checkpoint crawl.",
+        links=["/1", "/2", "/3"],
+    )
+    checkpoint_path = str(tmp_path / "crawl.checkpoint")
+    options = dict(follow_links=True, checkpoint_path=checkpoint_path)
+
+    def fetch_until_killed(url):
+        if len(crawl.fetched) == 3:
+            raise KeyboardInterrupt
+        return html
+
+    # saved when interrupted, long before checkpoint_every pages
+    with pytest.raises(KeyboardInterrupt):
+        crawl(fetch_until_killed, **options)
+
+    with open(checkpoint_path, "rb") as checkpoint_file:
+        state = pickle.load(checkpoint_file)
+
+    # the pages are only in the page log
+    assert "crawled_pages" not in state
+    assert state["page_log_size"] == os.path.getsize(checkpoint_path + ".pages")
+
+    with patch.object(Website, "check_ai_crawler_access") as check:
+        resumed = crawl(html, resume=True, **options)
+
+    check.assert_not_called()
+    assert sorted(p.url for p in resumed.crawled_pages) == [
+        "https://example.com/",
+        "https://example.com/1",
+        "https://example.com/2",
+        "https://example.com/3",
+    ]
+    assert resumed.bigrams["checkpoint crawl"] == 4
+    assert not os.path.exists(checkpoint_path)
+    assert not os.path.exists(checkpoint_path + ".pages")
+
+
+def test_resume_ignores_pages_logged_after_the_checkpoint(tmp_path, crawl):
+    html = page_html("Checkpoint page", links=["/1", "/2"])
+    checkpoint_path = str(tmp_path / "crawl.checkpoint")
+    options = dict(
+        follow_links=True,
+        checkpoint_path=checkpoint_path,
+        low_memory=True,
+    )
+
+    def fetch_until_killed(url):
+        if len(crawl.fetched) == 3:
+            raise KeyboardInterrupt
+        return html
+
+    with pytest.raises(KeyboardInterrupt):
+        crawl(fetch_until_killed, **options)
+
+    # half a record written by a crawl that died before checkpointing
+    with open(checkpoint_path + ".pages", "ab") as page_log:
+        page_log.write(pickle.dumps(("https://example.com/2", None))[:-4])
+
+    resumed = crawl(html, resume=True, **options)
+
+    assert crawl.fetched == ["https://example.com/2"]
+    assert sorted(p.url for p in resumed.crawled_pages) == [
+        "https://example.com/",
+        "https://example.com/1",
+        "https://example.com/2",
+    ]
+    assert all(p.ngrams is None for p in resumed.crawled_pages)
+    assert resumed.wordcount["paragraph"] == 3
+
+
+def test_crawl_skips_urls_disallowed_by_robots_txt(robots_txt, crawl):
+    robots_txt["text"] = (
+        "User-agent: *\n"
+        "Disallow: /private\n"
+        "Disallow: /*.pdf$\n"
+        "Allow: /private/open\n"
+    )
+    html = page_html(
+        "Robots page",
+        links=["/private/secret", "/private/open", "/file.pdf", "/file.pdf?x=1"],
+    )
+
+    site = crawl(html, follow_links=True)
+
+    assert sorted(p.url for p in site.crawled_pages) == [
+        "https://example.com/",
+        "https://example.com/file.pdf?x=1",
+        "https://example.com/private/open",
+    ]
+
+
+def test_crawl_honours_robots_txt_group_of_the_configured_user_agent(
+    robots_txt, crawl
+):
+    robots_txt["text"] = (
+        "User-agent: MyBot\n"
+        "Disallow: /private\n"
+        "Crawl-delay: 4\n"
+        "\n"
+        "User-agent: *\n"
+        "Disallow: /public\n"
+    )
+    html = page_html("Robots page", links=["/private", "/public"])
+
+    site = crawl(
+        html, follow_links=True, http=Http(user_agent="MyBot/1.0 (+https://x.y)")
+    )
+
+    assert sorted(p.url for p in site.crawled_pages) == [
+        "https://example.com/",
+        "https://example.com/public",
+    ]
+    assert site.scheduler.hosts["example.com"].bucket.rate == 0.25
+
+
+def test_check_ai_crawler_access_uses_parsed_groups(robots_txt):
+    robots_txt["text"] = (
+        "User-agent: GPTBot\n"
+        "User-agent: PerplexityBot\n"
+        "Disallow: /\n"
+        "\n"
+        "User-agent: ClaudeBot\n"
+        "Disallow: /private\n"
+        "\n"
+        "User-agent: *\n"
+        "Disallow: /\n"
+        "Crawl-delay: 2\n"
+    )
+
+    site = Website(base_url=BASE_URL, sitemap=None)
+
+    with patch.object(site.http, "get", side_effect=Exception):
+        result = site.check_ai_crawler_access()
+
+    assert result["robots_txt_found"] is True
+    assert result["blocked_ai_bots"] == ["GPTBot", "PerplexityBot"]
+    assert result["blocked_training_bots"] == ["GPTBot"]
+    assert result["blocked_retrieval_bots"] == ["PerplexityBot"]
+    assert site.scheduler.hosts["example.com"].bucket.rate == 0.5
+
+
+def test_crawl_skips_urls_whose_lastmod_has_not_advanced(tmp_path, crawl):
+    html = page_html("Lastmod page")
+    store_path = str(tmp_path / "pages.sqlite")
+
+    def crawl_sitemap(lastmods):
+        entries = [
+            SitemapEntry(f"https://example.com/{name}", lastmod, None)
+            for name, lastmod in lastmods.items()
+        ]
+
+        with patch("pyseoanalyzer.website.iter_sitemap", return_value=entries):
+            site = crawl(
+                html,
+                sitemap="https://example.com/sitemap.xml",
+                follow_links=True,
+                store_path=store_path,
+                skip_unchanged=True,
+            )
+
+        return site, sorted(crawl.fetched)
+
+    site, fetched = crawl_sitemap({"a": "2026-01-01", "b": "2026-01-01T10:00:00Z"})
+    assert len(fetched) == 3
+
+    site, fetched = crawl_sitemap(
+        {"a": "2026-01-01", "b": "2026-01-01T12:00:00+01:00"}
+    )
+
+    assert fetched == ["https://example.com/", "https://example.com/b"]
+    # a without fetching it, the others because their HTML is unchanged
+    assert site.reused_pages == 3
+    assert len(site.crawled_pages) == 3
+    assert site.wordcount["paragraph"] == 3
+
+    # the new lastmod of b was recorded
+    site, fetched = crawl_sitemap({"a": "2026-01-01", "b": "2026-01-01T11:00:00Z"})
+    assert fetched == ["https://example.com/"]
+
+
+class FakeEnhancer:
+    """
+    Stands in for LLMSEOEnhancer, recording what it was asked to analyze
+    """
+
+    def __init__(self, quick_wins=("fix titles",)):
+        self.quick_wins = list(quick_wins)
+        self.seen = []
+        self.groups = None
+
+    async def enhance_seo_analysis(self, seo_data):
+        self.seen.append(seo_data["text"])
+        return {"summary": {"words": len(seo_data["text"].split())}}
+
+    async def enhance_site_analysis(self, groups):
+        self.groups = groups
+        return {
+            "groups": {
+                name: {
+                    "sampled_urls": [page["url"] for page in pages],
+                    "summary": {"entity_score": 50},
+                    "analyses": [],
+                }
+                for name, pages in groups.items()
+            },
+            "recommendations": {
+                "quick_wins": self.quick_wins,
+                "strategic_recommendations": ["plan"],
+            },
+        }
+
+
+LLM_PAGE_HTML = page_html(
+    "LLM stage test page",
+    "Some words in a paragraph that trafilatura can extract for the LLM stage.",
+    links=["/next"],
+)
+
+
+def test_crawl_queues_pages_to_llm_stage(tmp_path, crawl):
+    enhancer = FakeEnhancer()
+    store_path = str(tmp_path / "pages.sqlite")
+
+    with patch.object(Page, "use_llm_analyzer") as page_llm:
+        site = crawl(
+            LLM_PAGE_HTML,
+            enhancer=enhancer,
+            follow_links=True,
+            max_pages=2,
+            run_llm_analysis=True,
+            store_path=store_path,
+        )
+
+    page_llm.assert_not_called()
+    assert len(enhancer.seen) == 2
+    assert "LLM stage" in enhancer.seen[0]
+    analysis = {"summary": {"words": len(enhancer.seen[0].split())}}
+    assert [p.llm_analysis for p in site.crawled_pages] == [analysis] * 2
+    assert site.llm_stage.loop is None
+
+    assert site.store.db is None
+
+    # stored with the analysis attached
+    stored = PageStore(store_path, settings=site._store_settings()).get(
+        BASE_URL, site.crawled_pages[0].content_hash
+    )
+    assert stored.llm_analysis == analysis
+
+
+def test_resumed_crawl_analyzes_restored_pages_with_the_llm(tmp_path, crawl):
+    checkpoint_path = str(tmp_path / "crawl.checkpoint")
+    options = dict(
+        follow_links=True,
+        run_llm_analysis=True,
+        checkpoint_path=checkpoint_path,
+        low_memory=True,
+    )
+
+    def fetch_until_killed(url):
+        if len(crawl.fetched) == 2:
+            raise KeyboardInterrupt
+        return LLM_PAGE_HTML
+
+    with pytest.raises(KeyboardInterrupt):
+        crawl(fetch_until_killed, enhancer=FakeEnhancer(), **options)
+
+    enhancer = FakeEnhancer()
+    resumed = crawl(LLM_PAGE_HTML, enhancer=enhancer, resume=True, **options)
+
+    assert sorted(p.url for p in resumed.crawled_pages) == [
+        "https://example.com/",
+        "https://example.com/next",
+    ]
+    # the restored page is analyzed again along with the new one
+    assert len(enhancer.seen) == 2
+    assert all(p.llm_analysis["summary"]["words"] for p in resumed.crawled_pages)
+
+
+def test_crawl_low_memory_store_and_llm_stage_reuse_full_pages(tmp_path, crawl):
+    options = dict(
+        follow_links=True,
+        max_pages=2,
+        low_memory=True,
+        store_path=str(tmp_path / "pages.sqlite"),
+        run_llm_analysis=True,
+    )
+
+    crawl(LLM_PAGE_HTML, enhancer=FakeEnhancer(), **options)
+    site = crawl(LLM_PAGE_HTML, enhancer=FakeEnhancer(), **options)
+
+    assert crawl.fetched == ["https://example.com/", "https://example.com/next"]
+    assert len(site.crawled_pages) == 2
+    assert site.reused_pages == 2
+    assert site.wordcount["paragraph"] == 2
+    assert all(p.llm_analysis["summary"]["words"] for p in site.crawled_pages)
+
+
+def test_crawl_site_llm_mode_samples_page_groups(crawl):
+    enhancer = FakeEnhancer()
+
+    def html(url):
+        return page_html(url, links=[f"/blog/post-{i}" for i in range(4)])
+
+    site = crawl(
+        html,
+        enhancer=enhancer,
+        follow_links=True,
+        run_llm_analysis=True,
+        llm_mode="site",
+        llm_samples_per_group=2,
+    )
+
+    assert len(site.crawled_pages) == 5
+    assert enhancer.seen == []
+    assert sorted(enhancer.groups) == ["/", "/blog/{slug}"]
+    assert len(enhancer.groups["/blog/{slug}"]) == 2
+
+    blog_pages = [p for p in site.crawled_pages if "/blog/" in p.url]
+    assert all(p.llm_analysis["page_group"] == "/blog/{slug}" for p in blog_pages)
+    assert all(p.llm_analysis["quick_wins"] == ["fix titles"] for p in blog_pages)
+    assert site.site_llm_analysis["recommendations"]["strategic_recommendations"] == [
+        "plan"
+    ]
+
+
+def test_crawl_site_llm_mode_low_memory_store_reuses_full_pages(tmp_path, crawl):
+    html = page_html("Site mode page", links=["/blog/a"])
+    options = dict(
+        follow_links=True,
+        low_memory=True,
+        store_path=str(tmp_path / "pages.sqlite"),
+        run_llm_analysis=True,
+        llm_mode="site",
+    )
+
+    crawl(html, enhancer=FakeEnhancer(), **options)
+    site = crawl(html, enhancer=FakeEnhancer(), **options)
+
+    assert len(site.crawled_pages) == 2
+    assert site.reused_pages == 2
+    assert site.wordcount["paragraph"] == 2
+    assert all(
+        p.llm_analysis["quick_wins"] == ["fix titles"] for p in site.crawled_pages
+    )
+
+
+def test_website_rejects_unknown_llm_mode():
+    with pytest.raises(ValueError):
+        Website(base_url=BASE_URL, sitemap=None, llm_mode="cluster")